@@ -6,13 +6,7 @@ from pydantic import BaseModel
 import asyncio
 import os
 from config.settings import Config
-from src.trends.trend_analyzer import TrendAnalyzer
-from src.content.script_generator import ScriptGenerator
-from src.content.audio_generator import AudioGenerator
-from src.content.visual_generator import VisualGenerator
-from src.content.thumbnail_generator import ThumbnailGenerator
-from src.video.video_editor import VideoEditor
-from src.upload.youtube_uploader import YouTubeUploader
+from src.core.registry import registry
 
 import queue
 
@@ -99,6 +93,8 @@ async def log_broadcaster():
 @app.on_event("startup")
 async def startup_event():
     asyncio.create_task(log_broadcaster())
+    # Build generators in the background so the first cycle does not pay for SDK imports
+    asyncio.get_running_loop().run_in_executor(None, registry.warm)
 
 async def run_automation_cycle():
     state.is_running = True
@@ -110,8 +106,9 @@ async def run_automation_cycle():
         state.current_action = "Analyzing Trends..."
         await manager.broadcast({"type": "status", "data": state.current_action})
         
-        trend_analyzer = TrendAnalyzer()
-        topic = trend_analyzer.select_topic()
+        trend_analyzer = registry.get('trend_analyzer')
+        keyword = trend_analyzer.select_keyword()
+        topic = trend_analyzer.select_topic(keyword=keyword)
         await manager.broadcast({"type": "log", "data": f"Selected Topic: {topic}"})
         
         if not topic:
@@ -121,37 +118,42 @@ async def run_automation_cycle():
         state.current_action = f"Generating Script for: {topic}"
         await manager.broadcast({"type": "status", "data": state.current_action})
         
-        script_gen = ScriptGenerator()
+        script_gen = registry.get('script_gen')
         script = script_gen.generate_script(topic)
         await manager.broadcast({"type": "log", "data": "Script generated."})
         
-        state.current_action = "Generating Audio..."
+        state.current_action = "Gathering Visuals..."
         await manager.broadcast({"type": "status", "data": state.current_action})
-        audio_gen = AudioGenerator()
-        audio_path = os.path.join(Config.ASSETS_DIR, "temp_audio.mp3")
-        audio_gen.generate_audio(script, audio_path)
+        visual_gen = registry.get('visual_gen')
+        # Clips download in the background while audio is generated
+        clip_stream = visual_gen.stream_stock_videos(keyword)
         
-        state.current_action = "Gathering Visuals..."
+        state.current_action = "Generating Audio..."
         await manager.broadcast({"type": "status", "data": state.current_action})
-        visual_gen = VisualGenerator()
-        query = " ".join(topic.split()[:2])
-        visual_paths = visual_gen.get_stock_videos(query)
+        audio_gen = registry.get('audio_gen')
+        audio_path = os.path.join(Config.ASSETS_DIR, "temp_audio.mp3")
+        try:
+            audio_gen.generate_audio(script, audio_path)
+        except Exception:
+            clip_stream.close()
+            raise
         
         # 3. Production - Using FFmpeg (memory efficient)
         state.current_action = "Editing Video..."
         await manager.broadcast({"type": "status", "data": state.current_action})
         
-        video_editor = VideoEditor()
+        video_editor = registry.get('video_editor')
         video_path = os.path.join(Config.ASSETS_DIR, "final_video.mp4")
-        final_video = video_editor.create_short(audio_path, visual_paths, script, video_path)
+        final_video = video_editor.create_short_streaming(audio_path, clip_stream, script, video_path)
         
         # 4. Upload
         state.current_action = "Uploading..."
         await manager.broadcast({"type": "status", "data": state.current_action})
         
         # Ensure auth before upload
-        uploader = YouTubeUploader()
+        uploader = registry.get('uploader')
         if not uploader.youtube:
+             registry.reset('uploader')
              await manager.broadcast({"type": "error", "data": "YouTube Auth failed. Please authenticate first."})
              raise Exception("Not Authenticated")
 
@@ -160,7 +162,7 @@ async def run_automation_cycle():
              tags = ["shorts", "ai", "facts", topic.split()[0]]
              
              # UNCOMMENT TO ENABLE REAL UPLOAD
-             # video_id = uploader.upload_video(final_video, topic, description, tags)
+             # video_id = uploader.publish(final_video, topic, description, tags, playlist_id=Config.YOUTUBE_PLAYLIST_ID)
              # await manager.broadcast({"type": "log", "data": f"Uploaded! ID: {video_id}"})
              
              await manager.broadcast({"type": "log", "data": "Upload simulated (Safety Mode). Uncomment in api/main.py to enable."})
@@ -206,7 +208,8 @@ def authenticate_youtube():
     Trigger OAuth flow explicitly
     """
     try:
-        uploader = YouTubeUploader()
+        registry.reset('uploader')
+        uploader = registry.get('uploader')
         if uploader.youtube:
             state.is_authenticated = True
             return {"message": "Authenticated successfully", "success": True}
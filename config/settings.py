@@ -12,13 +12,69 @@ class Config:
     # Paths
     BASE_DIR = os.path.dirname(os.path.abspath(__file__))
     ASSETS_DIR = os.path.join(BASE_DIR, '..', 'assets')
+    # SQLite ledgers and caches written by this node; must be on local disk, never on a shared ASSETS_DIR
+    STATE_DIR = os.getenv("STATE_DIR", os.path.join(BASE_DIR, '..', 'state'))
     
     # Settings
-    VIDEO_RESOLUTION = (1080, 1920) # 9:16 for Shorts, change to (1920, 1080) for long form
+    VIDEO_RESOLUTION = (1080, 1920) # 9:16 for Shorts
+    LONG_VIDEO_RESOLUTION = (1920, 1080) # 16:9 for long form
+    VIDEO_FORMAT = os.getenv("VIDEO_FORMAT", "short") # 'short' or 'long'
     FPS = 30
+
+    # Long-form rendering: the timeline is split into GOP-aligned segments encoded in parallel
+    GOP_SECONDS = 2
+    SEGMENT_SECONDS = int(os.getenv("SEGMENT_SECONDS", 30)) # Rounded to a multiple of GOP_SECONDS
+    RENDER_WORKERS = int(os.getenv("RENDER_WORKERS", 0)) or os.cpu_count() or 1
+
+    # Resource governor: renders are only admitted when their estimated footprint fits these budgets
+    RENDER_MEMORY_BUDGET_MB = int(os.getenv("RENDER_MEMORY_BUDGET_MB", 0)) # 0 = 75% of system memory
+    RENDER_CPU_BUDGET = int(os.getenv("RENDER_CPU_BUDGET", 0)) # 0 = all cores
+    RENDER_CHILD_MEMORY_LIMIT_MB = int(os.getenv("RENDER_CHILD_MEMORY_LIMIT_MB", 0)) # Peak RSS per FFmpeg child (killed above it), 0 = unlimited
+
+    # Audio post-processing, applied inside the final FFmpeg encode
+    AUDIO_LOUDNORM = os.getenv("AUDIO_LOUDNORM", "1") == "1"
+    AUDIO_TRIM_SILENCE = os.getenv("AUDIO_TRIM_SILENCE", "1") == "1"
+    TARGET_LOUDNESS_LUFS = float(os.getenv("TARGET_LOUDNESS_LUFS", -14)) # YouTube normalizes to about -14 LUFS
+    TARGET_TRUE_PEAK = float(os.getenv("TARGET_TRUE_PEAK", -1.5))
+    TARGET_LRA = float(os.getenv("TARGET_LRA", 11))
+    BACKGROUND_MUSIC_PATH = os.getenv("BACKGROUND_MUSIC_PATH") # Optional music bed, ducked under the narration
+    MUSIC_VOLUME_DB = float(os.getenv("MUSIC_VOLUME_DB", -18))
+
+    # Indexed stock clips used within this many hours are not picked again
+    CLIP_REUSE_HOURS = float(os.getenv("CLIP_REUSE_HOURS", 72))
+
+    # Thumbnails
+    THUMBNAIL_FONT = os.getenv("THUMBNAIL_FONT") # Path to a .ttf/.ttc, auto-detected if unset
+    THUMBNAIL_TIMESTAMP = float(os.getenv("THUMBNAIL_TIMESTAMP", 1.0)) # Seconds into the video for the background frame
     
     # Scheduler
     UPLOAD_FREQUENCY_HOURS = int(os.getenv("UPLOAD_FREQUENCY_HOURS", 24))
+    YOUTUBE_PLAYLIST_ID = os.getenv("YOUTUBE_PLAYLIST_ID") # Published videos are added to this playlist if set
+    PUBLISH_TIMES = os.getenv("PUBLISH_TIMES", "") # e.g. "09:00,17:30" (local time); empty = every UPLOAD_FREQUENCY_HOURS
+    BUFFER_TARGET = int(os.getenv("BUFFER_TARGET", 1)) # Minimum rendered videos kept ready to publish
+    PRODUCE_CHECK_MINUTES = int(os.getenv("PRODUCE_CHECK_MINUTES", 15))
+
+    # API quotas (units per window)
+    QUOTA_YOUTUBE_DAILY = int(os.getenv("QUOTA_YOUTUBE_DAILY", 10000)) # Resets at midnight Pacific
+    QUOTA_GEMINI_PER_MINUTE = int(os.getenv("QUOTA_GEMINI_PER_MINUTE", 15))
+    QUOTA_GEMINI_DAILY = int(os.getenv("QUOTA_GEMINI_DAILY", 1500))
+    QUOTA_PEXELS_HOURLY = int(os.getenv("QUOTA_PEXELS_HOURLY", 200))
+    QUOTA_PEXELS_MONTHLY = int(os.getenv("QUOTA_PEXELS_MONTHLY", 20000))
+
+    # Checkpointed jobs: failed jobs are resumed by later cycles up to this many attempts per stage
+    JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", 3))
+    JOB_RETENTION_DAYS = int(os.getenv("JOB_RETENTION_DAYS", 7))
+
+    # Analytics: stats of published videos feed back into topic selection
+    ANALYTICS_COLLECT_HOURS = int(os.getenv("ANALYTICS_COLLECT_HOURS", 6))
+    ANALYTICS_TRACK_DAYS = int(os.getenv("ANALYTICS_TRACK_DAYS", 90)) # Stop polling videos older than this
+    ANALYTICS_WEIGHT = float(os.getenv("ANALYTICS_WEIGHT", 0.5)) # 0 = ignore past performance
+    ANALYTICS_RECORD_PATH = os.getenv("ANALYTICS_RECORD_PATH") # Append raw snapshots here (JSON lines) for offline replay
+
+    # Distributed workers: redis://host:6379/0, or sqlite:///path for workers on a single host
+    BROKER_URL = os.getenv("BROKER_URL", "sqlite:///" + os.path.abspath(os.path.join(STATE_DIR, 'broker.db')))
+    BROKER_LEASE_SECONDS = int(os.getenv("BROKER_LEASE_SECONDS", 300))
+    BROKER_MAX_ATTEMPTS = int(os.getenv("BROKER_MAX_ATTEMPTS", 3))
 
     @staticmethod
     def validate():
@@ -1,15 +1,10 @@
 import time
 import logging
-from apscheduler.schedulers.blocking import BlockingScheduler
+import argparse
 from config.settings import Config
 import os
-from src.trends.trend_analyzer import TrendAnalyzer
-from src.content.script_generator import ScriptGenerator
-from src.content.audio_generator import AudioGenerator
-from src.content.visual_generator import VisualGenerator
-from src.content.thumbnail_generator import ThumbnailGenerator
-from src.video.video_editor import VideoEditor
-from src.upload.youtube_uploader import YouTubeUploader
+from src.core.registry import registry
+from src.pipeline.stages import Pipeline, STAGES
 
 # Configure logging
 logging.basicConfig(
@@ -22,6 +17,8 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+pipeline = Pipeline(registry)
+
 def job_cycle():
     """
     Main execution cycle:
@@ -33,59 +30,71 @@ def job_cycle():
     logger.info("Starting automated job cycle...")
     
     try:
-        # Initialize Modules
-        trend_analyzer = TrendAnalyzer()
-        script_gen = ScriptGenerator()
-        audio_gen = AudioGenerator()
-        visual_gen = VisualGenerator()
-        thumb_gen = ThumbnailGenerator()
-        video_editor = VideoEditor()
-        uploader = YouTubeUploader()
-
-        # Step 1: Trends
-        logger.info("Step 1: Analyzing trends...")
-        topic = trend_analyzer.select_topic()
-        if not topic:
-            logger.error("No topic selected. Aborting cycle.")
-            return
-
-        # Step 2: Content
-        logger.info(f"Step 2: Generating content for '{topic}'...")
-        script = script_gen.generate_script(topic, duration_type="short")
-        
-        audio_path = os.path.join(Config.ASSETS_DIR, "temp_audio.mp3")
-        audio_gen.generate_audio(script, audio_path)
-        
-        # Get visuals based on keywords from topic
-        # Simple keyword extraction (first 2 words)
-        query = " ".join(topic.split()[:2])
-        visual_paths = visual_gen.get_stock_videos(query, count=3)
-        
-        # Step 3: Production
-        logger.info("Step 3: Producing video...")
-        video_path = os.path.join(Config.ASSETS_DIR, "final_video.mp4")
-        final_video = video_editor.create_short(audio_path, visual_paths, script, video_path)
-        
-        thumb_path = os.path.join(Config.ASSETS_DIR, "thumbnail.jpg")
-        thumb_gen.create_thumbnail(topic, output_path=thumb_path)
-        
-        # Step 4: Upload
-        if final_video and os.path.exists(final_video):
-            logger.info("Step 4: Uploading...")
-            # Generate description
-            description = f"An AI generated video about {topic}.\n\n#shorts #ai #facts"
-            tags = ["shorts", "ai", "facts", topic.split()[0]]
-            
-            uploader.upload_video(final_video, topic, description, tags)
+        pipeline.prune_jobs()
+        # Resume an interrupted job first: finished stages (TTS, downloads, renders) are skipped
+        job = pipeline.find_resumable()
+        if job:
+            logger.info(f"Resuming job {job['job_id']}...")
         else:
-            logger.error("Video generation failed, skipping upload.")
-        
+            job = pipeline.new_job()
+        pipeline.run(job)
         logger.info("Job cycle completed successfully.")
         
     except Exception as e:
         logger.error(f"Job cycle failed: {e}", exc_info=True)
 
+def run_coordinator(broker_url=None):
+    """Submit a job to the broker on the upload schedule; render-workers do the rest."""
+    from apscheduler.schedulers.blocking import BlockingScheduler
+    from src.distributed.broker import get_broker
+    from src.distributed.worker import Coordinator
+
+    coordinator = Coordinator(get_broker(broker_url), pipeline)
+    scheduler = BlockingScheduler()
+    scheduler.add_job(coordinator.submit_cycle, 'interval', hours=Config.UPLOAD_FREQUENCY_HOURS)
+    logger.info(f"Coordinator started. Submitting a job every {Config.UPLOAD_FREQUENCY_HOURS} hours.")
+    try:
+        coordinator.submit_cycle()
+        scheduler.start()
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Coordinator stopped.")
+
+def run_worker(broker_url=None, stages=None, max_jobs=None):
+    from src.distributed.broker import get_broker
+    from src.distributed.worker import RenderWorker
+
+    worker = RenderWorker(get_broker(broker_url), pipeline, stages=stages)
+    try:
+        worker.run(max_jobs=max_jobs)
+    except (KeyboardInterrupt, SystemExit):
+        logger.info("Worker stopped.")
+
 def main():
+    parser = argparse.ArgumentParser(description="YouTube Automation Agent")
+    parser.add_argument('mode', nargs='?', default='run', choices=['run', 'coordinator', 'render-worker'],
+                        help="run: whole pipeline in this process (default); coordinator: only submit jobs "
+                             "to the broker; render-worker: execute stages pulled from the broker")
+    parser.add_argument('--broker', help="Broker URL (default: BROKER_URL)")
+    parser.add_argument('--stages', help=f"Comma-separated stages this worker runs (default: {','.join(STAGES)})")
+    parser.add_argument('--max-jobs', type=int, help="Exit after this many stage jobs (render-worker)")
+    parser.add_argument('--once', action='store_true', help="Run a single job cycle and exit (run)")
+    parser.add_argument('--profile-imports', action='store_true',
+                        help="Print an import-time profile of the heavy SDKs and exit")
+    args = parser.parse_args()
+
+    if args.profile_imports:
+        from src.core.lazy_imports import profile_imports, format_import_report
+        print(format_import_report(profile_imports()))
+        return
+
+    if args.mode == 'coordinator':
+        Config.validate()
+        return run_coordinator(args.broker)
+    if args.mode == 'render-worker':
+        Config.validate()
+        stages = args.stages.split(',') if args.stages else None
+        return run_worker(args.broker, stages, args.max_jobs)
+
     logger.info("Initializing YouTube Automation Agent...")
     Config.validate()
     
@@ -93,19 +102,14 @@ def main():
     if not os.path.exists(Config.ASSETS_DIR):
         os.makedirs(Config.ASSETS_DIR)
     
-    scheduler = BlockingScheduler()
-    
-    # Schedule the job
-    scheduler.add_job(job_cycle, 'interval', hours=Config.UPLOAD_FREQUENCY_HOURS)
-    
-    logger.info(f"Scheduler started. Running every {Config.UPLOAD_FREQUENCY_HOURS} hours.")
-    
+    if args.once:
+        return job_cycle()
+
+    from src.scheduling.publisher import BufferedScheduler
+
+    # Renders run ahead into a buffer; publish slots upload from it
     try:
-        # Run once immediately for verification
-        logger.info("Running initial verification cycle...")
-        job_cycle()
-        
-        scheduler.start()
+        BufferedScheduler(pipeline).start()
     except (KeyboardInterrupt, SystemExit):
         logger.info("Agent stopped.")
 
@@ -0,0 +1,227 @@
+import logging
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+from config.settings import Config
+
+logger = logging.getLogger(__name__)
+
+# Ages (hours since publishing) at which decay curves are sampled
+DECAY_AGES = (1, 6, 24, 48, 168, 720)
+
+def _parse_time(value):
+    """RFC 3339 timestamp from the API (e.g. 2024-05-01T12:00:00Z) -> epoch seconds."""
+    return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+
+class PerformanceStore:
+    """
+    Local time series of how published videos perform.
+    `videos` holds one row per upload with its latest counters, so per-keyword
+    aggregates are a single indexed GROUP BY; `samples` keeps the history, storing
+    a point only when a counter changed, and feeds the decay curves.
+    """
+    def __init__(self, db_path=None):
+        self.db_path = db_path or os.path.join(Config.STATE_DIR, "performance.db")
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.executescript("""
+                CREATE TABLE IF NOT EXISTS videos (
+                    video_id TEXT PRIMARY KEY,
+                    topic TEXT,
+                    keyword TEXT,
+                    format TEXT,
+                    published_at REAL,
+                    views INTEGER DEFAULT 0,
+                    likes INTEGER DEFAULT 0,
+                    comments INTEGER DEFAULT 0,
+                    updated_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS videos_keyword ON videos (keyword);
+                CREATE TABLE IF NOT EXISTS samples (
+                    video_id TEXT,
+                    age_hours REAL,
+                    views INTEGER,
+                    likes INTEGER,
+                    comments INTEGER,
+                    PRIMARY KEY (video_id, age_hours)
+                ) WITHOUT ROWID;
+                CREATE TABLE IF NOT EXISTS channel_samples (
+                    ts REAL PRIMARY KEY,
+                    subscribers INTEGER,
+                    views INTEGER,
+                    videos INTEGER
+                );
+            """)
+
+    def track(self, video_id, topic, keyword=None, video_format=None, published_at=None):
+        """Start following a published video."""
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT OR IGNORE INTO videos (video_id, topic, keyword, format, published_at) VALUES (?, ?, ?, ?, ?)",
+                (video_id, topic, (keyword or topic).lower(), video_format, published_at or time.time()))
+
+    def tracked(self, max_age_days=None):
+        """Tracked videos (dicts), newest first; older than `max_age_days` are left out."""
+        max_age_days = Config.ANALYTICS_TRACK_DAYS if max_age_days is None else max_age_days
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT video_id, topic, keyword, format, published_at FROM videos "
+                "WHERE published_at >= ? ORDER BY published_at DESC",
+                (time.time() - max_age_days * 86400,)).fetchall()
+        return [dict(zip(('video_id', 'topic', 'keyword', 'format', 'published_at'), row)) for row in rows]
+
+    def record(self, snapshot):
+        """
+        Store one collection pass:
+        {'ts': epoch, 'channel': channels.list statistics, 'videos': {video_id: videos.list item}}
+        Returns the number of new samples.
+        """
+        ts = snapshot.get('ts') or time.time()
+        added = 0
+        with self._lock, self._conn:
+            for video_id, item in snapshot.get('videos', {}).items():
+                row = self._conn.execute(
+                    "SELECT published_at, updated_at, views, likes, comments FROM videos WHERE video_id = ?",
+                    (video_id,)).fetchone()
+                if not row:
+                    continue
+                published_at = row[0]
+                if item.get('snippet', {}).get('publishedAt'):
+                    published_at = _parse_time(item['snippet']['publishedAt'])
+                stats = item.get('statistics', {})
+                counters = (int(stats.get('viewCount', 0)), int(stats.get('likeCount', 0)),
+                            int(stats.get('commentCount', 0)))
+                if row[1] is None or ts >= row[1]:
+                    if row[1] is not None and row[2:] == counters:
+                        continue  # Unchanged since the last pass: the previous point already describes it
+                    self._conn.execute(
+                        "UPDATE videos SET published_at = ?, views = ?, likes = ?, comments = ?, updated_at = ? "
+                        "WHERE video_id = ?", (published_at, *counters, ts, video_id))
+                age_hours = round(max(0.0, ts - published_at) / 3600, 2)
+                self._conn.execute("INSERT OR REPLACE INTO samples VALUES (?, ?, ?, ?, ?)",
+                                   (video_id, age_hours, *counters))
+                added += 1
+
+            channel = snapshot.get('channel')
+            if channel:
+                self._conn.execute("INSERT OR REPLACE INTO channel_samples VALUES (?, ?, ?, ?)",
+                                   (ts, int(channel.get('subscriberCount', 0)), int(channel.get('viewCount', 0)),
+                                    int(channel.get('videoCount', 0))))
+        return added
+
+    def keyword_views(self, min_age_hours=24):
+        """
+        {keyword: (videos, average views)} over videos at least `min_age_hours` old,
+        so uploads from the last few hours do not drag their keyword down.
+        """
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT keyword, COUNT(*), AVG(views) FROM videos "
+                "WHERE updated_at IS NOT NULL AND published_at <= ? GROUP BY keyword",
+                (time.time() - min_age_hours * 3600,)).fetchall()
+        return {keyword: (count, average) for keyword, count, average in rows}
+
+    def keyword_weights(self, keywords, strength=None):
+        """
+        Multiplier per keyword from its past performance relative to the channel
+        average (1.0 without data). Few videos pull the weight towards 1.0.
+        """
+        strength = Config.ANALYTICS_WEIGHT if strength is None else strength
+        views = self.keyword_views()
+        weights = {keyword: 1.0 for keyword in keywords}
+        total = sum(count for count, _ in views.values())
+        if not total or not strength:
+            return weights
+        channel_average = sum(count * average for count, average in views.values()) / total
+        if not channel_average:
+            return weights
+        for keyword in keywords:
+            if keyword.lower() not in views:
+                continue
+            count, average = views[keyword.lower()]
+            confidence = count / (count + 3)
+            weight = 1 + strength * confidence * (average / channel_average - 1)
+            weights[keyword] = min(4.0, max(0.25, weight))
+        return weights
+
+    def decay_curve(self, keyword=None, ages=DECAY_AGES):
+        """
+        [(age_hours, average views, videos)]: views reached by each age, averaged over
+        the videos old enough to have reached it.
+        """
+        curve = []
+        now = time.time()
+        with self._lock:
+            for age in ages:
+                query = ("SELECT AVG(v), COUNT(*) FROM (SELECT MAX(s.views) AS v FROM samples s "
+                         "JOIN videos USING (video_id) WHERE s.age_hours <= ? AND videos.published_at <= ?")
+                params = [age, now - age * 3600]
+                if keyword:
+                    query += " AND videos.keyword = ?"
+                    params.append(keyword.lower())
+                average, count = self._conn.execute(query + " GROUP BY s.video_id)", params).fetchone()
+                if count:
+                    curve.append((age, average, count))
+        return curve
+
+    def collect(self, uploader, record_path=None):
+        """
+        Fetch current statistics for every tracked video (batched, 50 IDs per call)
+        plus the channel totals, and store them. If `record_path` is given the raw
+        snapshot is appended there as a fixture for offline replay.
+        """
+        tracked = self.tracked()
+        snapshot = {
+            'ts': time.time(),
+            'tracked': tracked,
+            'channel': uploader.get_channel_stats(),
+            'videos': uploader.get_video_stats([video['video_id'] for video in tracked]),
+        }
+        added = self.record(snapshot)
+        logger.info(f"Analytics: {len(snapshot['videos'])}/{len(tracked)} videos collected, {added} new samples")
+        if record_path:
+            with open(record_path, 'a') as f:
+                f.write(json.dumps(snapshot) + "\n")
+        return snapshot
+
+    def replay(self, fixture_path):
+        """Load recorded snapshots (one JSON object per line). Returns how many were applied."""
+        applied = 0
+        with open(fixture_path) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                snapshot = json.loads(line)
+                for video in snapshot.get('tracked', []):
+                    self.track(video['video_id'], video['topic'], video.get('keyword'),
+                               video.get('format'), video.get('published_at'))
+                self.record(snapshot)
+                applied += 1
+        return applied
+
+_store = None
+_store_lock = threading.Lock()
+
+def get_performance_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = PerformanceStore()
+        return _store
+
+if __name__ == "__main__":
+    # python -m src.analytics.performance_store [fixture.jsonl]: replay a recording, then print the aggregates
+    logging.basicConfig(level=logging.INFO)
+    store = get_performance_store()
+    if len(sys.argv) > 1:
+        print(f"Replayed {store.replay(sys.argv[1])} snapshots")
+    for keyword, (count, average) in sorted(store.keyword_views().items(), key=lambda kv: -kv[1][1]):
+        print(f"{keyword:30} {count:4d} videos  {average:10.0f} avg views")
+    for age, average, count in store.decay_curve():
+        print(f"{age:5d}h  {average:10.0f} views  ({count} videos)")
@@ -1,9 +1,11 @@
 import logging
 import asyncio
-import edge_tts
 from config.settings import Config
+from src.core.lazy_imports import lazy_import
 import concurrent.futures
 
+edge_tts = lazy_import('edge_tts')
+
 logger = logging.getLogger(__name__)
 
 class AudioGenerator:
@@ -11,6 +13,11 @@ class AudioGenerator:
         # Voice options: en-US-ChristopherNeural, en-US-EricNeural, en-US-GuyNeural, en-US-JennyNeural, en-US-AriaNeural
         self.voice = "en-US-ChristopherNeural" 
 
+    @staticmethod
+    def estimate_duration(text, words_per_minute=155):
+        """Rough narration length in seconds, available before TTS runs."""
+        return len(text.split()) * 60 / words_per_minute
+
     async def _generate_audio_async(self, text, output_file):
         communicate = edge_tts.Communicate(text, self.voice)
         await communicate.save(output_file)
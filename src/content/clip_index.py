@@ -0,0 +1,263 @@
+import logging
+import os
+import json
+import sqlite3
+import subprocess
+import threading
+import time
+import concurrent.futures
+from config.settings import Config
+from src.core.lazy_imports import lazy_import
+
+np = lazy_import('numpy')
+
+logger = logging.getLogger(__name__)
+
+# Ignored when matching a search query against indexed clips
+STOP_WORDS = {'the', 'of', 'a', 'an', 'and', 'or', 'to', 'in', 'on', 'for', 'with'}
+
+def hamming(hash_a, hash_b):
+    return bin(int(hash_a, 16) ^ int(hash_b, 16)).count('1')
+
+class ClipIndex:
+    """
+    Local index over the downloaded stock clips.
+    Each clip is analyzed once (duration, resolution, scene-change timestamps and a
+    64-bit difference hash of its middle frame) so selecting footage for a topic is
+    a database lookup instead of a search and download.
+    """
+    def __init__(self, db_path=None, scene_threshold=0.3):
+        self.db_path = db_path or os.path.join(Config.STATE_DIR, "clip_index.db")
+        self.scene_threshold = scene_threshold
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+        with self._lock, self._conn:
+            self._conn.execute("""
+                CREATE TABLE IF NOT EXISTS clips (
+                    path TEXT PRIMARY KEY,
+                    video_id TEXT,
+                    query TEXT,
+                    size INTEGER,
+                    mtime REAL,
+                    duration REAL,
+                    width INTEGER,
+                    height INTEGER,
+                    scenes TEXT,
+                    phash TEXT,
+                    indexed_at REAL,
+                    last_used REAL,
+                    use_count INTEGER DEFAULT 0
+                )
+            """)
+            columns = {row[1] for row in self._conn.execute("PRAGMA table_info(clips)")}
+            if 'last_used' not in columns:  # Index created before usage was tracked
+                self._conn.execute("ALTER TABLE clips ADD COLUMN last_used REAL")
+                self._conn.execute("ALTER TABLE clips ADD COLUMN use_count INTEGER DEFAULT 0")
+
+    def add(self, path, query=None, video_id=None, used=False):
+        """
+        Analyze and index a clip. Skips clips whose size and mtime are unchanged.
+        used: the clip was just downloaded for a video, so it counts as used now.
+        """
+        path = os.path.abspath(path)
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute("SELECT size, mtime, query FROM clips WHERE path = ?", (path,)).fetchone()
+        if row and row[0] == stat.st_size and row[1] == stat.st_mtime:
+            if query and query not in (row[2] or ''):
+                # Same clip found by another search: remember both queries
+                with self._lock, self._conn:
+                    self._conn.execute("UPDATE clips SET query = ? WHERE path = ?",
+                                       (f"{row[2]} | {query}" if row[2] else query, path))
+            if used:
+                self.mark_used([path])
+            return
+
+        info = self.analyze(path)
+        if not info:
+            return
+        with self._lock, self._conn:
+            # Upsert so a re-analyzed clip keeps its usage history
+            self._conn.execute(
+                "INSERT INTO clips (path, video_id, query, size, mtime, duration, width, height, scenes, phash, "
+                "indexed_at, last_used, use_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?) "
+                "ON CONFLICT (path) DO UPDATE SET video_id = excluded.video_id, "
+                "query = COALESCE(excluded.query, query), size = excluded.size, mtime = excluded.mtime, "
+                "duration = excluded.duration, width = excluded.width, height = excluded.height, "
+                "scenes = excluded.scenes, phash = excluded.phash, indexed_at = excluded.indexed_at, "
+                "last_used = COALESCE(excluded.last_used, last_used), use_count = use_count + excluded.use_count",
+                (path, str(video_id) if video_id else None, query, stat.st_size, stat.st_mtime,
+                 info['duration'], info['width'], info['height'], json.dumps(info['scenes']),
+                 info['phash'], time.time(), time.time() if used else None, 1 if used else 0))
+        logger.info(f"Indexed clip {os.path.basename(path)}: {info['duration']:.1f}s, "
+                    f"{info['width']}x{info['height']}, {len(info['scenes'])} scene changes")
+
+    def add_async(self, path, query=None, video_id=None, used=False):
+        """Index in the background so analysis stays off the download/encode critical path."""
+        def task():
+            try:
+                self.add(path, query, video_id, used)
+            except Exception as e:
+                logger.error(f"Failed to index {path}: {e}")
+        return self._executor.submit(task)
+
+    def mark_used(self, paths):
+        with self._lock, self._conn:
+            self._conn.executemany("UPDATE clips SET last_used = ?, use_count = use_count + 1 WHERE path = ?",
+                                   [(time.time(), os.path.abspath(path)) for path in paths])
+
+    def scan(self, directory=None):
+        """
+        Index every downloaded stock clip (<pexels id>.mp4) in the asset directory
+        that is not indexed yet. Clips indexed this way have no query until a search
+        finds them again; until then select() only uses them as a fallback.
+        """
+        directory = directory or Config.ASSETS_DIR
+        if not os.path.isdir(directory):
+            return
+        for name in sorted(os.listdir(directory)):
+            if name.endswith('.mp4') and name[:-4].isdigit():
+                try:
+                    self.add(os.path.join(directory, name), video_id=os.path.splitext(name)[0])
+                except Exception as e:
+                    logger.error(f"Failed to index {name}: {e}")
+
+    def scan_async(self, directory=None):
+        """Pick up clips downloaded by earlier runs without delaying startup."""
+        return self._executor.submit(self.scan, directory)
+
+    def analyze(self, path):
+        """Compute duration, resolution, scene changes and perceptual hash with FFmpeg."""
+        probe = self._probe(path)
+        if not probe:
+            return None
+        duration, width, height = probe
+        return {
+            'duration': duration,
+            'width': width,
+            'height': height,
+            'scenes': self._scene_changes(path),
+            'phash': self._dhash(path, duration / 2),
+        }
+
+    def select(self, query, target_duration, orientation='portrait', exclude=(), max_distance=10,
+               untagged=False, reuse_hours=None):
+        """
+        Pick indexed clips for a query whose total duration covers target_duration.
+        Near-duplicate clips (perceptual hash within max_distance bits) are skipped, and
+        clips used in the last `reuse_hours` are left out so the shortfall is downloaded
+        fresh instead of repeating the same footage in every video.
+        untagged: fall back on clips with no query (picked up by scan()).
+        Selected clips are marked used. Returns (paths, covered_seconds).
+        """
+        reuse_hours = Config.CLIP_REUSE_HOURS if reuse_hours is None else reuse_hours
+        words = [w for w in query.lower().split() if w not in STOP_WORDS] or query.lower().split()
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT path, video_id, query, duration, width, height, scenes, phash, last_used FROM clips "
+                "WHERE last_used IS NULL OR last_used < ?", (time.time() - reuse_hours * 3600,)).fetchall()
+
+        candidates = []
+        for path, video_id, clip_query, duration, width, height, scenes, phash, last_used in rows:
+            if path in exclude or (video_id and video_id in exclude):
+                continue
+            if (orientation == 'portrait') != (height > width):
+                continue
+            matches = sum(1 for w in words if w in (clip_query or '').lower())
+            if not matches and (clip_query or not untagged):
+                continue
+            if not os.path.exists(path):
+                self._remove(path)
+                continue
+            # Prefer relevant clips, then the least recently used, then more cuts/motion per second
+            scene_rate = len(json.loads(scenes or '[]')) / duration if duration else 0
+            candidates.append((-matches, last_used or 0, -scene_rate, path, duration, phash))
+
+        candidates.sort()
+        selected, hashes, covered = [], [], 0
+        for _, _, _, path, duration, phash in candidates:
+            if covered >= target_duration:
+                break
+            if phash and any(hamming(phash, h) <= max_distance for h in hashes):
+                continue
+            selected.append(path)
+            covered += duration
+            if phash:
+                hashes.append(phash)
+        if selected:
+            self.mark_used(selected)
+
+        logger.info(f"Clip index: {len(selected)} clips cover {covered:.1f}/{target_duration:.1f}s for '{query}'")
+        return selected, covered
+
+    def _remove(self, path):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM clips WHERE path = ?", (path,))
+
+    def _probe(self, path):
+        cmd = [
+            'ffprobe',
+            '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'stream=width,height:format=duration',
+            '-of', 'json',
+            path
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            data = json.loads(result.stdout)
+            stream = data['streams'][0]
+            return float(data['format']['duration']), int(stream['width']), int(stream['height'])
+        except Exception as e:
+            logger.error(f"Failed to probe {path}: {e}")
+            return None
+
+    def _scene_changes(self, path):
+        """Timestamps (s) where the scene score exceeds the threshold, on a downscaled decode."""
+        cmd = [
+            'ffmpeg', '-hide_banner',
+            '-i', path,
+            '-an',
+            '-vf', f"scale=160:-2,select='gt(scene,{self.scene_threshold})',showinfo",
+            '-f', 'null', '-'
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+        except subprocess.TimeoutExpired:
+            return []
+        scenes = []
+        for line in result.stderr.splitlines():
+            if 'showinfo' in line and 'pts_time:' in line:
+                try:
+                    scenes.append(round(float(line.split('pts_time:')[1].split()[0]), 3))
+                except (ValueError, IndexError):
+                    continue
+        return scenes
+
+    def _dhash(self, path, timestamp):
+        """64-bit difference hash of a 9x8 grayscale frame, as a hex string."""
+        cmd = [
+            'ffmpeg',
+            '-ss', f"{timestamp:.3f}",
+            '-i', path,
+            '-frames:v', '1',
+            '-vf', 'scale=9:8,format=gray',
+            '-f', 'rawvideo', '-'
+        ]
+        try:
+            result = subprocess.run(cmd, capture_output=True, timeout=30)
+            pixels = np.frombuffer(result.stdout, dtype=np.uint8)
+            if pixels.size != 72:
+                return None
+            pixels = pixels.reshape(8, 9).astype(np.int16)
+            bits = (pixels[:, 1:] > pixels[:, :-1]).flatten()
+            return f"{int(''.join('1' if b else '0' for b in bits), 2):016x}"
+        except Exception as e:
+            logger.error(f"Failed to hash {path}: {e}")
+            return None
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    ClipIndex().scan()
@@ -1,6 +1,9 @@
 import logging
-import google.generativeai as genai
 from config.settings import Config
+from src.core.lazy_imports import lazy_import
+from src.scheduling.quota import get_quota_tracker
+
+genai = lazy_import('google.generativeai')
 
 logger = logging.getLogger(__name__)
 
@@ -44,6 +47,7 @@ class ScriptGenerator:
             """
 
         try:
+            get_quota_tracker().consume('gemini')
             response = self.model.generate_content(prompt)
             script = response.text
             logger.info("Script generated successfully.")
@@ -1,75 +1,223 @@
 import logging
-from PIL import Image, ImageDraw, ImageFont
+from PIL import Image, ImageDraw, ImageFont, ImageOps
 import os
 import random
+import subprocess
+import functools
+import concurrent.futures
 from config.settings import Config
 
 logger = logging.getLogger(__name__)
 
+THUMBNAIL_SIZE = (1280, 720)
+
+# Searched in order when THUMBNAIL_FONT is not set
+FONT_CANDIDATES = [
+    "/System/Library/Fonts/Helvetica.ttc", # Mac default
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/dejavu/DejaVuSans-Bold.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Bold.ttf",
+    "/usr/share/fonts/liberation-sans/LiberationSans-Bold.ttf",
+    "C:\\Windows\\Fonts\\arialbd.ttf",
+]
+
+@functools.lru_cache(maxsize=1)
+def find_font_path():
+    """Return the first usable TrueType font path, or None."""
+    for path in [Config.THUMBNAIL_FONT] + FONT_CANDIDATES:
+        if path and os.path.exists(path):
+            return path
+    logger.warning("No TrueType font found, thumbnails will use the default bitmap font.")
+    return None
+
+@functools.lru_cache(maxsize=32)
+def load_font(font_path, size):
+    """Load a font once per (path, size) per process."""
+    if font_path:
+        try:
+            return ImageFont.truetype(font_path, size)
+        except OSError as e:
+            logger.warning(f"Failed to load font {font_path}: {e}")
+    try:
+        return ImageFont.load_default(size=size)  # Pillow >= 10.1 scales the default font
+    except TypeError:
+        return ImageFont.load_default()
+
+def wrap_text(text, font, max_width):
+    """
+    Greedy word wrap using measured glyph widths rather than character counts.
+    A single word wider than max_width gets its own line.
+    """
+    lines = []
+    current = ""
+    for word in text.split():
+        candidate = f"{current} {word}" if current else word
+        if current and font.getlength(candidate) > max_width:
+            lines.append(current)
+            current = word
+        else:
+            current = candidate
+    if current:
+        lines.append(current)
+    return lines
+
+def fit_text(text, font_path, max_width, max_height, max_size=96, min_size=40, line_spacing=10):
+    """
+    Pick the largest font size whose wrapped text fits the box.
+    Returns (font, lines).
+    """
+    size = max_size
+    while True:
+        font = load_font(font_path, size)
+        lines = wrap_text(text, font, max_width)
+        ascent, descent = font.getmetrics()
+        block_height = len(lines) * (ascent + descent) + (len(lines) - 1) * line_spacing
+        if block_height <= max_height or size <= min_size:
+            return font, lines
+        size -= 8
+
+def extract_frame(video_path, timestamp, output_path):
+    """
+    Grab a single frame from a rendered video.
+    -ss before -i does one keyframe seek instead of decoding up to the timestamp.
+    """
+    cmd = [
+        'ffmpeg', '-y',
+        '-ss', f"{max(timestamp, 0):.3f}",
+        '-i', video_path,
+        '-frames:v', '1',
+        '-q:v', '2',
+        output_path
+    ]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
+        if result.returncode != 0 or not os.path.exists(output_path):
+            logger.error(f"Frame grab failed: {result.stderr[-500:]}")
+            return None
+        return output_path
+    except Exception as e:
+        logger.error(f"Frame grab failed: {e}")
+        return None
+
+def render_thumbnail(title, output_path, background_image_path=None, font_path=None,
+                     text_color="white", shadow_color="black", background_color=None):
+    """
+    Render one thumbnail. Module-level so it can run in a worker process.
+    """
+    width, height = THUMBNAIL_SIZE
+
+    if background_image_path and os.path.exists(background_image_path):
+        with Image.open(background_image_path) as src:
+            # Scale and center-crop instead of stretching
+            img = ImageOps.fit(src.convert('RGB'), (width, height), Image.LANCZOS)
+    else:
+        # Create a random solid color background
+        color = background_color or (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
+        img = Image.new('RGB', (width, height), color=color)
+
+    draw = ImageDraw.Draw(img)
+
+    margin = int(width * 0.08)
+    line_spacing = 10
+    font, lines = fit_text(title, font_path, width - 2 * margin, height - 2 * margin, line_spacing=line_spacing)
+    ascent, descent = font.getmetrics()
+    line_height = ascent + descent
+
+    # Draw text centered
+    block_height = len(lines) * line_height + (len(lines) - 1) * line_spacing
+    y_text = (height - block_height) / 2
+    offset = max(2, line_height // 25)
+    for line in lines:
+        x_text = (width - font.getlength(line)) / 2
+
+        # Draw shadow/outline
+        draw.text((x_text + offset, y_text + offset), line, font=font, fill=shadow_color)
+
+        # Draw text
+        draw.text((x_text, y_text), line, font=font, fill=text_color)
+        y_text += line_height + line_spacing
+
+    img.save(output_path)
+    return output_path
+
+def _render_variant(kwargs):
+    return render_thumbnail(**kwargs)
+
 class ThumbnailGenerator:
     def __init__(self):
-        self.font_path = "/System/Library/Fonts/Helvetica.ttc" # Mac default
-        # Fallback or download a font if needed
+        self.font_path = find_font_path()
 
-    def create_thumbnail(self, title, background_image_path=None, output_path="thumbnail.jpg"):
+    def create_thumbnail(self, title, background_image_path=None, output_path="thumbnail.jpg",
+                         video_path=None, timestamp=None):
         """
         Create a thumbnail with text overlay.
+        If video_path is given, the background is a frame grabbed at `timestamp` seconds.
         """
         logger.info(f"Creating thumbnail for: {title}")
-        
-        width, height = 1280, 720
-        
-        if background_image_path and os.path.exists(background_image_path):
-            img = Image.open(background_image_path)
-            img = img.resize((width, height))
-        else:
-            # Create a random solid color background
-            color = (random.randint(0, 255), random.randint(0, 255), random.randint(0, 255))
-            img = Image.new('RGB', (width, height), color=color)
 
-        draw = ImageDraw.Draw(img)
-        
-        # Load font
+        frame_path = None
+        if video_path and not background_image_path:
+            frame_path = self._frame_path(output_path, timestamp)
+            background_image_path = extract_frame(video_path, timestamp or 1.0, frame_path)
+
         try:
-            font = ImageFont.truetype(self.font_path, 80)
-        except:
-            font = ImageFont.load_default()
-
-        # Text wrapping (simple)
-        words = title.split()
-        lines = []
-        current_line = []
-        for word in words:
-            current_line.append(word)
-            if len(" ".join(current_line)) > 15: # Arbitrary char limit
-                lines.append(" ".join(current_line))
-                current_line = []
-        if current_line:
-            lines.append(" ".join(current_line))
-
-        # Draw text centered
-        y_text = height / 2 - (len(lines) * 40)
-        for line in lines:
-            # Get text bbox
-            bbox = draw.textbbox((0, 0), line, font=font)
-            text_width = bbox[2] - bbox[0]
-            text_height = bbox[3] - bbox[1]
-            
-            x_text = (width - text_width) / 2
-            
-            # Draw shadow/outline
-            shadow_color = "black"
-            offset = 3
-            draw.text((x_text+offset, y_text+offset), line, font=font, fill=shadow_color)
-            
-            # Draw text
-            draw.text((x_text, y_text), line, font=font, fill="white")
-            y_text += text_height + 10
-
-        img.save(output_path)
+            render_thumbnail(title, output_path, background_image_path, self.font_path)
+        finally:
+            if frame_path and os.path.exists(frame_path):
+                os.remove(frame_path)
+
         logger.info(f"Thumbnail saved to {output_path}")
         return output_path
 
+    def create_variants(self, variants, video_path=None, timestamp=None, output_dir=None, max_workers=None):
+        """
+        Render many thumbnail variants (e.g. for A/B tests) in parallel worker processes.
+        variants: list of dicts with 'title' and optional 'output_path', 'timestamp',
+                  'text_color', 'shadow_color', 'background_image_path'.
+        Each distinct timestamp is grabbed from the video once and shared by its variants.
+        Returns the output paths in the same order (None for failed variants).
+        """
+        output_dir = output_dir or Config.ASSETS_DIR
+        os.makedirs(output_dir, exist_ok=True)
+
+        frames = {}
+        jobs = []
+        for i, variant in enumerate(variants):
+            variant = dict(variant)
+            title = variant.pop('title')
+            output_path = variant.pop('output_path', os.path.join(output_dir, f"thumbnail_{i}.jpg"))
+            # Same fallback as create_thumbnail for a missing timestamp
+            ts = variant.pop('timestamp', None) or timestamp or 1.0
+
+            if video_path and not variant.get('background_image_path'):
+                if ts not in frames:
+                    frames[ts] = extract_frame(video_path, ts, self._frame_path(os.path.join(output_dir, "frame.jpg"), ts))
+                variant['background_image_path'] = frames[ts]
+
+            jobs.append(dict(variant, title=title, output_path=output_path, font_path=self.font_path))
+
+        logger.info(f"Rendering {len(jobs)} thumbnail variants from {len(frames)} frame(s)...")
+        results = [None] * len(jobs)
+        try:
+            with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(_render_variant, job): i for i, job in enumerate(jobs)}
+                for future in concurrent.futures.as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as e:
+                        logger.error(f"Thumbnail variant {futures[future]} failed: {e}")
+        finally:
+            for frame in frames.values():
+                if frame and os.path.exists(frame):
+                    os.remove(frame)
+
+        logger.info(f"Rendered {sum(1 for r in results if r)}/{len(jobs)} thumbnail variants.")
+        return results
+
+    def _frame_path(self, output_path, timestamp):
+        base, _ = os.path.splitext(output_path)
+        return f"{base}_frame_{(timestamp or 0):.2f}.jpg"
+
 if __name__ == "__main__":
     gen = ThumbnailGenerator()
     gen.create_thumbnail("AMAZING AI FACTS")
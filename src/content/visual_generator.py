@@ -2,14 +2,68 @@ import logging
 import requests
 import random
 import os
+import queue
+import threading
+import concurrent.futures
 from config.settings import Config
+from src.content.clip_index import ClipIndex
+from src.scheduling.quota import get_quota_tracker
 
 logger = logging.getLogger(__name__)
 
+class ClipStream:
+    """
+    Iterable of local clip paths, yielded in search order as each download finishes.
+    Searching and downloading start in the background as soon as the stream is created,
+    so callers can do other work (TTS, encoding earlier clips) while clips arrive.
+    `local_paths` (already on disk) are yielded first.
+    """
+    _DONE = object()
+
+    def __init__(self, search_fn, download_fn, max_workers=3, local_paths=()):
+        self._local_paths = list(local_paths)
+        self._pending = queue.Queue()
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers)
+        self._closed = threading.Event()
+        threading.Thread(target=self._produce, args=(search_fn, download_fn), daemon=True).start()
+
+    def _produce(self, search_fn, download_fn):
+        try:
+            for video_id, url in search_fn():
+                if self._closed.is_set():
+                    break
+                self._pending.put(self._executor.submit(download_fn, video_id, url))
+        except Exception as e:
+            logger.error(f"Failed to fetch stock videos: {e}")
+        finally:
+            self._pending.put(self._DONE)
+            self._executor.shutdown(wait=False)
+
+    def close(self):
+        """Stop a stream nobody will consume: queued downloads are cancelled, running ones finish."""
+        self._closed.set()
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def __iter__(self):
+        yield from self._local_paths
+        while True:
+            future = self._pending.get()
+            if future is self._DONE:
+                return
+            try:
+                path = future.result()
+            except Exception as e:
+                logger.error(f"Download failed: {e}")
+                continue
+            if path:
+                yield path
+
 class VisualGenerator:
     def __init__(self):
         self.api_key = Config.PEXELS_API_KEY
         self.base_url = "https://api.pexels.com/videos/search"
+        self.index = ClipIndex()
+        self.index.scan_async()
 
     def get_stock_videos(self, query, count=2, duration_min=5, orientation='portrait'):
         """
@@ -17,64 +71,96 @@ class VisualGenerator:
         orientation: 'portrait' (for Shorts) or 'landscape'
         NOTE: Reduced count to 2 to prevent system overload
         """
+        return list(self.stream_stock_videos(query, count, duration_min, orientation))
+
+    def stream_stock_videos(self, query, count=2, duration_min=5, orientation='portrait', target_duration=None):
+        """
+        Like get_stock_videos, but returns a ClipStream immediately.
+        Clips are downloaded in parallel and yielded in order as each one lands on disk.
+        target_duration: seconds of footage needed. When given, clips from the local
+        clip index are used first and Pexels is only searched for the shortfall.
+        """
+        local_paths = []
+        if target_duration:
+            # Without Pexels, clips no search has tagged yet are better than no footage
+            local_paths, covered = self.index.select(query, target_duration, orientation,
+                                                     untagged=not self.api_key)
+            if covered >= target_duration:
+                logger.info(f"Using {len(local_paths)} indexed clips, no download needed.")
+                return local_paths
+            # Only download roughly what the library is missing
+            missing = target_duration - covered
+            count = max(1, min(count, int(missing // max(duration_min, 1)) + 1))
+
         if not self.api_key:
             logger.error("PEXELS_API_KEY is missing.")
-            return []
+            return local_paths
+
+        exclude = {os.path.abspath(p) for p in local_paths}
+        return ClipStream(lambda: self._search_videos(query, count, duration_min, orientation, exclude),
+                          lambda video_id, url: self._fetch_video(video_id, url, query),
+                          local_paths=local_paths)
 
+    def _search_videos(self, query, count, duration_min, orientation, exclude=()):
+        """Return up to `count` (video_id, download_url) pairs for a Pexels search."""
         headers = {'Authorization': self.api_key}
         params = {
             'query': query,
-            'per_page': count,
+            'per_page': count * 2,  # Headroom for results dropped by the filters below
             'orientation': orientation,
             'size': 'small'  # Use smaller size to save memory/bandwidth
         }
 
-        try:
-            logger.info(f"Searching Pexels for: {query}")
-            response = requests.get(self.base_url, headers=headers, params=params, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            
-            video_files = []
-            for video in data.get('videos', []):
-                # Find a suitable video file url
-                files = video.get('video_files', [])
-                
-                # Filter for smaller files (width <= 1080) to reduce memory usage
-                files = [f for f in files if f.get('width', 9999) <= 1080]
-                
-                if not files:
-                    continue
-                    
-                # Sort by quality (width) but prefer smaller for memory efficiency
-                files.sort(key=lambda x: x['width'])
-                
-                if files:
-                    video_url = files[0]['link']
-                    # Download the video
-                    filename = f"{video['id']}.mp4"
-                    filepath = os.path.join(Config.ASSETS_DIR, filename)
-                    
-                    # Skip if already downloaded
-                    if os.path.exists(filepath):
-                        logger.info(f"Video already exists: {filepath}")
-                        video_files.append(filepath)
-                        continue
-                    
-                    if not os.path.exists(Config.ASSETS_DIR):
-                        os.makedirs(Config.ASSETS_DIR)
-                        
-                    self._download_file(video_url, filepath)
-                    video_files.append(filepath)
-            
-            return video_files
+        logger.info(f"Searching Pexels for: {query}")
+        get_quota_tracker().consume('pexels')
+        response = requests.get(self.base_url, headers=headers, params=params, timeout=10)
+        response.raise_for_status()
+        data = response.json()
 
-        except Exception as e:
-            logger.error(f"Failed to fetch stock videos: {e}")
-            return []
+        results = []
+        for video in data.get('videos', []):
+            if len(results) >= count:
+                break
+            if video.get('duration', duration_min) < duration_min:
+                continue
+            if os.path.abspath(os.path.join(Config.ASSETS_DIR, f"{video['id']}.mp4")) in exclude:
+                continue
+
+            # Find a suitable video file url
+            files = video.get('video_files', [])
+
+            # Filter for smaller files (width <= 1080) to reduce memory usage
+            files = [f for f in files if f.get('width', 9999) <= 1080]
+
+            if not files:
+                continue
+
+            # Sort by quality (width) but prefer smaller for memory efficiency
+            files.sort(key=lambda x: x['width'])
+            results.append((video['id'], files[0]['link']))
+
+        return results
+
+    def _fetch_video(self, video_id, video_url, query=None):
+        """Download one clip into the asset cache and queue it for indexing. Returns the local path or None."""
+        filename = f"{video_id}.mp4"
+        filepath = os.path.join(Config.ASSETS_DIR, filename)
+
+        # Skip if already downloaded
+        if os.path.exists(filepath):
+            logger.info(f"Video already exists: {filepath}")
+        else:
+            os.makedirs(Config.ASSETS_DIR, exist_ok=True)
+            if not self._download_file(video_url, filepath):
+                return None
+
+        self.index.add_async(filepath, query=query, video_id=video_id, used=True)
+        return filepath
 
     def _download_file(self, url, filepath):
         logger.info(f"Downloading {url} to {filepath}")
+        # Download to a temp name so a partial file is never mistaken for a cached clip
+        part_path = filepath + ".part"
         try:
             with requests.get(url, stream=True, timeout=30) as r:
                 r.raise_for_status()
@@ -82,15 +168,18 @@ class VisualGenerator:
                 total_size = int(r.headers.get('content-length', 0))
                 if total_size > 50 * 1024 * 1024:  # 50MB limit per video
                     logger.warning(f"Video too large ({total_size/1024/1024:.1f}MB), skipping")
-                    return
+                    return None
                 
-                with open(filepath, 'wb') as f:
+                with open(part_path, 'wb') as f:
                     for chunk in r.iter_content(chunk_size=1024 * 1024):  # 1MB chunks
                         f.write(chunk)
+            os.replace(part_path, filepath)
+            return filepath
         except Exception as e:
             logger.error(f"Download failed: {e}")
-            if os.path.exists(filepath):
-                os.remove(filepath)
+            if os.path.exists(part_path):
+                os.remove(part_path)
+            return None
 
 if __name__ == "__main__":
     gen = VisualGenerator()
@@ -0,0 +1,124 @@
+import logging
+import importlib
+import subprocess
+import sys
+import types
+import os
+
+logger = logging.getLogger(__name__)
+
+# Third-party SDKs that dominate cold start. Used by the import-time report.
+HEAVY_MODULES = [
+    'google.generativeai',
+    'googleapiclient.discovery',
+    'google_auth_oauthlib.flow',
+    'pytrends.request',
+    'edge_tts',
+    'moviepy',
+    'PIL.Image',
+    'apscheduler.schedulers.blocking',
+    'fastapi',
+]
+
+class LazyModule(types.ModuleType):
+    """
+    Module stand-in that performs the real import on first attribute access.
+    """
+    def __init__(self, name):
+        super().__init__(name)
+        self._module = None
+
+    def _load(self):
+        if self._module is None:
+            logger.debug(f"Lazy-loading module: {self.__name__}")
+            self._module = importlib.import_module(self.__name__)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+def lazy_import(name):
+    """
+    Return the module if it is already imported, otherwise a LazyModule proxy.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    return LazyModule(name)
+
+def profile_imports(modules=None, top=10):
+    """
+    Measure import cost of each module in a fresh interpreter using `-X importtime`.
+    Returns a list of dicts sorted by cumulative import time (slowest first).
+    """
+    modules = modules or HEAVY_MODULES
+    project_root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+    results = []
+
+    # Imports done by interpreter startup itself are not attributable to any module
+    baseline = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'pass'],
+                              capture_output=True, text=True, cwd=project_root, timeout=60)
+    startup = {e['name'] for e in _parse_importtime(baseline.stderr)}
+
+    for module in modules:
+        cmd = [sys.executable, '-X', 'importtime', '-c', f'import {module}']
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, cwd=project_root, timeout=120)
+        except subprocess.TimeoutExpired:
+            results.append({'module': module, 'status': 'timeout', 'cumulative_ms': None, 'heaviest': []})
+            continue
+
+        entries = [e for e in _parse_importtime(result.stderr) if e['name'] not in startup]
+        if result.returncode != 0:
+            results.append({'module': module, 'status': 'not installed', 'cumulative_ms': None, 'heaviest': []})
+            continue
+
+        # The last entry for the requested module holds its total (cumulative) cost
+        total = next((e['cumulative_us'] for e in reversed(entries) if e['name'] == module), None)
+        if total is None and entries:
+            total = max(e['cumulative_us'] for e in entries)
+        heaviest = sorted(entries, key=lambda e: e['self_us'], reverse=True)[:top]
+        results.append({
+            'module': module,
+            'status': 'ok',
+            'cumulative_ms': (total or 0) / 1000,
+            'heaviest': [(e['name'], e['self_us'] / 1000) for e in heaviest],
+        })
+
+    results.sort(key=lambda r: r['cumulative_ms'] or 0, reverse=True)
+    return results
+
+def _parse_importtime(stderr):
+    """Parse `import time: self [us] | cumulative | imported package` lines."""
+    entries = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:'):
+            continue
+        parts = line[len('import time:'):].split('|')
+        if len(parts) != 3:
+            continue
+        try:
+            self_us = int(parts[0].strip())
+            cumulative_us = int(parts[1].strip())
+        except ValueError:
+            continue  # Header line
+        entries.append({'name': parts[2].strip(), 'self_us': self_us, 'cumulative_us': cumulative_us})
+    return entries
+
+def format_import_report(results):
+    """Render profile_imports() output as a plain-text report."""
+    lines = ["Import-time profile (fresh interpreter per module)", ""]
+    total = 0
+    for r in results:
+        if r['status'] != 'ok':
+            lines.append(f"  {r['module']:<36} {r['status']}")
+            continue
+        total += r['cumulative_ms']
+        lines.append(f"  {r['module']:<36} {r['cumulative_ms']:>9.1f} ms")
+        for name, self_ms in r['heaviest'][:3]:
+            lines.append(f"      {name:<32} {self_ms:>9.1f} ms self")
+    lines.append("")
+    lines.append(f"  {'Total (upper bound, shared deps counted per module)':<36} {total:>9.1f} ms")
+    return "\n".join(lines)
+
+if __name__ == "__main__":
+    print(format_import_report(profile_imports()))
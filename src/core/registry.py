@@ -0,0 +1,81 @@
+import logging
+import importlib
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# name -> "module:Class". Modules are only imported when the component is first needed.
+DEFAULT_COMPONENTS = {
+    'trend_analyzer': 'src.trends.trend_analyzer:TrendAnalyzer',
+    'script_gen': 'src.content.script_generator:ScriptGenerator',
+    'audio_gen': 'src.content.audio_generator:AudioGenerator',
+    'visual_gen': 'src.content.visual_generator:VisualGenerator',
+    'thumb_gen': 'src.content.thumbnail_generator:ThumbnailGenerator',
+    'video_editor': 'src.video.video_editor:VideoEditor',
+    'uploader': 'src.upload.youtube_uploader:YouTubeUploader',
+}
+
+# Components that can be built without user interaction (the uploader may start an OAuth flow)
+WARMABLE_COMPONENTS = ['trend_analyzer', 'script_gen', 'audio_gen', 'visual_gen', 'thumb_gen', 'video_editor']
+
+class ComponentRegistry:
+    """
+    Long-lived holder for pipeline components.
+    Each component is built once on first use and reused by every later cycle.
+    """
+    def __init__(self, factories=None):
+        self._factories = dict(factories or {})
+        self._instances = {}
+        self._locks = {}
+        self._guard = threading.Lock()
+
+    def register(self, name, factory):
+        """
+        factory: a zero-argument callable or a "module:Class" string.
+        """
+        with self._guard:
+            self._factories[name] = factory
+            self._instances.pop(name, None)
+
+    def get(self, name):
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+
+        with self._guard:
+            if name not in self._factories:
+                raise KeyError(f"Unknown component: {name}")
+            lock = self._locks.setdefault(name, threading.Lock())
+
+        # Per-component lock so a slow build does not block unrelated components
+        with lock:
+            if name not in self._instances:
+                start = time.perf_counter()
+                self._instances[name] = self._build(self._factories[name])
+                logger.info(f"Initialized component '{name}' in {time.perf_counter() - start:.2f}s")
+            return self._instances[name]
+
+    def reset(self, name=None):
+        """Drop a cached component (or all of them) so it is rebuilt on next use."""
+        with self._guard:
+            if name is None:
+                self._instances.clear()
+            else:
+                self._instances.pop(name, None)
+
+    def warm(self, names=None):
+        """Build components ahead of time. Failures are logged, not raised."""
+        for name in names or WARMABLE_COMPONENTS:
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.warning(f"Failed to warm component '{name}': {e}")
+
+    def _build(self, factory):
+        if isinstance(factory, str):
+            module_name, _, attr = factory.partition(':')
+            factory = getattr(importlib.import_module(module_name), attr)
+        return factory()
+
+registry = ComponentRegistry(DEFAULT_COMPONENTS)
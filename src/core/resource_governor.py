@@ -0,0 +1,220 @@
+import logging
+import os
+import subprocess
+import threading
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from config.settings import Config
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+MeasuredResult = namedtuple('MeasuredResult', ['returncode', 'stdout', 'stderr', 'peak_rss_mb', 'cpu_seconds', 'wall_seconds'])
+
+_CLK_TCK = os.sysconf('SC_CLK_TCK') if hasattr(os, 'sysconf') else 100
+
+def system_memory_mb():
+    """Return (total, available) memory in MB from /proc/meminfo, or (None, None)."""
+    values = {}
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                key, _, rest = line.partition(':')
+                values[key] = int(rest.split()[0]) / 1024
+    except (OSError, ValueError, IndexError):
+        return None, None
+    return values.get('MemTotal'), values.get('MemAvailable')
+
+def _read_peak_rss_mb(pid):
+    """VmHWM is the kernel-tracked peak RSS, so sampling cannot miss short spikes."""
+    try:
+        with open(f'/proc/{pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) / 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+def _read_cpu_seconds(pid):
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            # The command name may contain spaces, so split after its closing paren
+            fields = f.read().rsplit(')', 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / _CLK_TCK  # utime + stime
+    except (OSError, ValueError, IndexError):
+        return None
+
+def _apply_limits(pid):
+    """
+    Disable core dumps for an already started child. Done from the parent with prlimit(2)
+    because preexec_fn is unsafe in a threaded process and forces the slow fork path.
+    """
+    if resource is None or not hasattr(resource, 'prlimit'):
+        return
+    try:
+        resource.prlimit(pid, resource.RLIMIT_CORE, (0, 0))
+    except (OSError, ValueError) as e:  # The child may already have exited
+        logger.debug(f"Could not apply limits to pid {pid}: {e}")
+
+def run_measured(cmd, timeout, memory_limit_mb=None, sample_interval=0.2):
+    """
+    Run a command while sampling its peak RSS and CPU time.
+    memory_limit_mb caps RSS, the same figure the governor budgets: the sampler kills
+    the child once its peak RSS exceeds it (an RLIMIT_AS cap would be virtual memory,
+    which encoders reserve far beyond what they touch).
+    Module-level so render worker processes can use it directly.
+    Raises subprocess.TimeoutExpired like subprocess.run.
+    """
+    start = time.monotonic()
+    proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    _apply_limits(proc.pid)
+    stats = {'peak_rss_mb': None, 'cpu_seconds': None, 'killed': False}
+    done = threading.Event()
+
+    def sample():
+        while not done.is_set():
+            rss = _read_peak_rss_mb(proc.pid)
+            cpu = _read_cpu_seconds(proc.pid)
+            if rss is not None:
+                stats['peak_rss_mb'] = max(stats['peak_rss_mb'] or 0, rss)
+            if cpu is not None:
+                stats['cpu_seconds'] = cpu
+            if memory_limit_mb and rss is not None and rss > memory_limit_mb:
+                stats['killed'] = True
+                proc.kill()
+                return
+            done.wait(sample_interval)
+
+    sampler = threading.Thread(target=sample, daemon=True)
+    sampler.start()
+    try:
+        stdout, stderr = proc.communicate(timeout=timeout)
+    except subprocess.TimeoutExpired:
+        proc.kill()
+        proc.communicate()
+        raise
+    finally:
+        done.set()
+        sampler.join()
+
+    if stats['killed']:
+        stderr += f"\nKilled: peak RSS {stats['peak_rss_mb']:.0f} MB exceeded the {memory_limit_mb} MB limit"
+        logger.warning(f"Killed {cmd[0]} (pid {proc.pid}) at {stats['peak_rss_mb']:.0f} MB RSS, "
+                       f"limit {memory_limit_mb} MB")
+    return MeasuredResult(proc.returncode, stdout, stderr, stats['peak_rss_mb'],
+                          stats['cpu_seconds'], time.monotonic() - start)
+
+class ResourceGovernor:
+    """
+    Admission control for FFmpeg renders.
+    A render only starts when its estimated memory and CPU footprint fits the
+    remaining budget. Estimates are learned from the measured peak RSS and CPU
+    use of previous renders of the same kind.
+    """
+    def __init__(self, memory_budget_mb=None, cpu_budget=None, child_memory_limit_mb=None):
+        total, _ = system_memory_mb()
+        self.memory_budget_mb = memory_budget_mb or Config.RENDER_MEMORY_BUDGET_MB or (total * 0.75 if total else 2048)
+        self.cpu_budget = cpu_budget or Config.RENDER_CPU_BUDGET or os.cpu_count() or 1
+        self.child_memory_limit_mb = child_memory_limit_mb or Config.RENDER_CHILD_MEMORY_LIMIT_MB or None
+        self._reserved_mb = 0
+        self._reserved_cpu = 0
+        self._running = 0
+        self._estimates = {}  # kind -> {'memory_mb': ..., 'cpu': ...}
+        self._cond = threading.Condition()
+
+    def estimate(self, kind, resolution=None, threads=None):
+        """Return (memory_mb, cpu_cores) expected for one render of this kind."""
+        learned = self._estimates.get(kind)
+        if learned:
+            # 20% headroom over the smoothed observed peak
+            return learned['memory_mb'] * 1.2, learned['cpu']
+
+        width, height = resolution or Config.VIDEO_RESOLUTION
+        # Rough default for x264 + scaler: decoder/encoder frame buffers dominate
+        memory_mb = 150 + width * height * 60 / (1024 * 1024)
+        cpu = threads or os.cpu_count() or 1
+        return memory_mb, min(cpu, self.cpu_budget)
+
+    def acquire(self, kind, resolution=None, threads=None):
+        """
+        Block until the render fits the budget, then reserve it.
+        A render is always admitted when nothing else is running, so a single
+        over-budget job degrades to serial execution instead of deadlocking.
+        Returns a ticket for release().
+        """
+        memory_mb, cpu = self.estimate(kind, resolution, threads)
+        waited = False
+        with self._cond:
+            while self._running and (self._reserved_mb + memory_mb > self.memory_budget_mb
+                                     or self._reserved_cpu + cpu > self.cpu_budget):
+                if not waited:
+                    logger.info(f"Render '{kind}' waiting for resources "
+                                f"({self._reserved_mb:.0f}/{self.memory_budget_mb:.0f} MB, "
+                                f"{self._reserved_cpu:.1f}/{self.cpu_budget} cores reserved)")
+                    waited = True
+                self._cond.wait()
+            self._reserved_mb += memory_mb
+            self._reserved_cpu += cpu
+            self._running += 1
+        return (kind, memory_mb, cpu)
+
+    def release(self, ticket, measured=None):
+        """Free a reservation and learn from the measured result, if any."""
+        kind, memory_mb, cpu = ticket
+        if measured is not None:
+            self.record(kind, measured)
+        with self._cond:
+            self._reserved_mb -= memory_mb
+            self._reserved_cpu -= cpu
+            self._running -= 1
+            self._cond.notify_all()
+
+    def record(self, kind, measured):
+        if not measured.peak_rss_mb:
+            return
+        cores = (measured.cpu_seconds or 0) / measured.wall_seconds if measured.wall_seconds else 1
+        cores = max(0.5, min(cores, self.cpu_budget))
+        with self._cond:
+            previous = self._estimates.get(kind)
+            if previous:
+                # Exponential moving average, but never below the latest peak
+                memory_mb = max(measured.peak_rss_mb, 0.7 * previous['memory_mb'] + 0.3 * measured.peak_rss_mb)
+                cores = 0.7 * previous['cpu'] + 0.3 * cores
+            else:
+                memory_mb = measured.peak_rss_mb
+            self._estimates[kind] = {'memory_mb': memory_mb, 'cpu': cores}
+        logger.info(f"Render '{kind}' used {measured.peak_rss_mb:.0f} MB peak RSS, "
+                    f"{cores:.1f} cores over {measured.wall_seconds:.1f}s")
+
+    @contextmanager
+    def admit(self, kind, resolution=None, threads=None):
+        ticket = self.acquire(kind, resolution, threads)
+        result = {}
+        try:
+            yield result
+        finally:
+            self.release(ticket, result.get('measured'))
+
+    def run(self, cmd, kind, timeout, resolution=None, threads=None):
+        """Run an FFmpeg command once it is admitted. Returns a MeasuredResult."""
+        with self.admit(kind, resolution, threads) as slot:
+            slot['measured'] = run_measured(cmd, timeout, self.child_memory_limit_mb)
+            return slot['measured']
+
+_governor = None
+_governor_lock = threading.Lock()
+
+def get_governor():
+    """Process-wide governor shared by every render."""
+    global _governor
+    with _governor_lock:
+        if _governor is None:
+            _governor = ResourceGovernor()
+            logger.info(f"Render budget: {_governor.memory_budget_mb:.0f} MB, {_governor.cpu_budget} cores")
+        return _governor
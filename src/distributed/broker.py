@@ -0,0 +1,309 @@
+import logging
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from config.settings import Config
+from src.core.lazy_imports import lazy_import
+
+redis = lazy_import('redis')
+
+logger = logging.getLogger(__name__)
+
+class LeasedJob:
+    """A job handed to one worker until its lease expires."""
+    def __init__(self, job_id, stage, payload, attempts):
+        self.job_id = job_id
+        self.stage = stage
+        self.payload = payload
+        self.attempts = attempts
+
+    def __repr__(self):
+        return f"LeasedJob({self.job_id}, stage={self.stage}, attempt={self.attempts})"
+
+class SQLiteBroker:
+    """
+    File-based broker for workers on a single host. It uses WAL journaling, which
+    does not work on network filesystems: keep the database on local disk and use
+    Redis when workers run on several machines.
+    Jobs are leased for a fixed time; a worker that stops heartbeating loses the
+    lease and the job is re-delivered to another worker, up to max_attempts.
+    """
+    def __init__(self, path):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        with self._tx() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    stage TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    max_attempts INTEGER NOT NULL,
+                    worker TEXT,
+                    lease_expires REAL,
+                    error TEXT,
+                    result TEXT,
+                    created_at REAL,
+                    updated_at REAL
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, stage, created_at)")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS workers (
+                    id TEXT PRIMARY KEY,
+                    stages TEXT,
+                    last_seen REAL
+                )
+            """)
+
+    def _conn(self):
+        # One connection per thread; heartbeats run on their own thread
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def _tx(self):
+        broker = self
+
+        class _Transaction:
+            def __enter__(self):
+                self.conn = broker._conn()
+                self.conn.execute("BEGIN IMMEDIATE")  # Take the write lock up front
+                return self.conn
+
+            def __exit__(self, exc_type, exc, tb):
+                self.conn.execute("ROLLBACK" if exc_type else "COMMIT")
+        return _Transaction()
+
+    def enqueue(self, stage, payload, max_attempts=None):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._tx() as conn:
+            self._insert(conn, job_id, stage, payload, max_attempts, now)
+        logger.info(f"Enqueued {stage} job {job_id}")
+        return job_id
+
+    def _insert(self, conn, job_id, stage, payload, max_attempts, now):
+        conn.execute(
+            "INSERT INTO jobs (id, stage, payload, status, max_attempts, created_at, updated_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+            (job_id, stage, json.dumps(payload), max_attempts or Config.BROKER_MAX_ATTEMPTS, now, now))
+
+    def lease(self, worker_id, stages, lease_seconds):
+        """Atomically claim the oldest queued job for one of `stages`, or return None."""
+        now = time.time()
+        placeholders = ",".join("?" for _ in stages)
+        with self._tx() as conn:
+            self._requeue_expired(conn, now)
+            row = conn.execute(
+                f"SELECT id, stage, payload, attempts FROM jobs WHERE status = 'queued' AND stage IN ({placeholders}) "
+                "ORDER BY created_at LIMIT 1", list(stages)).fetchone()
+            if not row:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = 'leased', worker = ?, lease_expires = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ?", (worker_id, now + lease_seconds, now, row[0]))
+        return LeasedJob(row[0], row[1], json.loads(row[2]), row[3] + 1)
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        """Extend a lease. Returns False if the worker no longer holds it."""
+        now = time.time()
+        with self._tx() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ?, updated_at = ? WHERE id = ? AND worker = ? AND status = 'leased'",
+                (now + lease_seconds, now, job_id, worker_id))
+            return cursor.rowcount == 1
+
+    def complete(self, job_id, worker_id, result=None, follow_up=None):
+        """
+        Mark a job done and, in the same transaction, enqueue its follow-up
+        (stage, payload) so a crash can never drop or duplicate the next stage.
+        Returns False if the lease was lost (the result is then discarded).
+        """
+        now = time.time()
+        with self._tx() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (json.dumps(result), now, job_id, worker_id))
+            if cursor.rowcount != 1:
+                return False
+            if follow_up:
+                self._insert(conn, uuid.uuid4().hex, follow_up[0], follow_up[1], None, now)
+        return True
+
+    def fail(self, job_id, worker_id, error):
+        """Release a job after an error. It is re-queued until max_attempts is reached."""
+        now = time.time()
+        with self._tx() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+                "error = ?, worker = NULL, lease_expires = NULL, updated_at = ? "
+                "WHERE id = ? AND worker = ? AND status = 'leased'",
+                (str(error), now, job_id, worker_id))
+
+    def _requeue_expired(self, conn, now):
+        expired = conn.execute(
+            "SELECT id, worker FROM jobs WHERE status = 'leased' AND lease_expires < ?", (now,)).fetchall()
+        for job_id, worker in expired:
+            logger.warning(f"Lease on job {job_id} held by {worker} expired, re-delivering")
+        conn.execute(
+            "UPDATE jobs SET status = CASE WHEN attempts < max_attempts THEN 'queued' ELSE 'failed' END, "
+            "error = 'lease expired', worker = NULL, lease_expires = NULL, updated_at = ? "
+            "WHERE status = 'leased' AND lease_expires < ?", (now, now))
+
+    def register_worker(self, worker_id, stages):
+        with self._tx() as conn:
+            conn.execute("INSERT OR REPLACE INTO workers VALUES (?, ?, ?)", (worker_id, ",".join(stages), time.time()))
+
+    def stats(self):
+        """Job counts by (stage, status) plus workers seen in the last few lease periods."""
+        conn = self._conn()
+        counts = conn.execute("SELECT stage, status, COUNT(*) FROM jobs GROUP BY stage, status").fetchall()
+        workers = conn.execute("SELECT id, stages, last_seen FROM workers WHERE last_seen > ?",
+                               (time.time() - 3 * Config.BROKER_LEASE_SECONDS,)).fetchall()
+        return {
+            'jobs': {f"{stage}:{status}": count for stage, status, count in counts},
+            'workers': [{'id': w[0], 'stages': w[1].split(','), 'last_seen': w[2]} for w in workers],
+        }
+
+# Lease/requeue/complete must be atomic across workers, so they run as Lua scripts
+_LEASE_LUA = """
+local id = redis.call('RPOP', KEYS[1])
+if not id then return nil end
+local key = ARGV[3] .. ':job:' .. id
+redis.call('ZADD', KEYS[2], ARGV[1], id)
+redis.call('HSET', key, 'status', 'leased', 'worker', ARGV[2], 'lease_expires', ARGV[1])
+redis.call('HINCRBY', key, 'attempts', 1)
+return id
+"""
+
+_REQUEUE_LUA = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then return 0 end
+local key = ARGV[2] .. ':job:' .. ARGV[1]
+local attempts = tonumber(redis.call('HGET', key, 'attempts'))
+local max_attempts = tonumber(redis.call('HGET', key, 'max_attempts'))
+redis.call('HSET', key, 'worker', '', 'error', ARGV[3])
+if attempts < max_attempts then
+    redis.call('HSET', key, 'status', 'queued')
+    redis.call('LPUSH', ARGV[2] .. ':queue:' .. redis.call('HGET', key, 'stage'), ARGV[1])
+else
+    redis.call('HSET', key, 'status', 'failed')
+end
+return 1
+"""
+
+_HEARTBEAT_LUA = """
+local key = ARGV[3] .. ':job:' .. ARGV[1]
+if redis.call('HGET', key, 'worker') ~= ARGV[2] or redis.call('HGET', key, 'status') ~= 'leased' then return 0 end
+redis.call('ZADD', KEYS[1], ARGV[4], ARGV[1])
+redis.call('HSET', key, 'lease_expires', ARGV[4])
+return 1
+"""
+
+_COMPLETE_LUA = """
+local key = ARGV[3] .. ':job:' .. ARGV[1]
+if redis.call('HGET', key, 'worker') ~= ARGV[2] or redis.call('HGET', key, 'status') ~= 'leased' then return 0 end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HSET', key, 'status', 'done', 'result', ARGV[4])
+if ARGV[5] ~= '' then
+    local next_key = ARGV[3] .. ':job:' .. ARGV[5]
+    redis.call('HSET', next_key, 'stage', ARGV[6], 'payload', ARGV[7], 'status', 'queued',
+               'attempts', 0, 'max_attempts', ARGV[8], 'created_at', ARGV[9])
+    redis.call('LPUSH', ARGV[3] .. ':queue:' .. ARGV[6], ARGV[5])
+end
+return 1
+"""
+
+class RedisBroker:
+    """
+    Redis-backed broker for workers on several hosts. Same interface as SQLiteBroker.
+    Queues are lists per stage (LPUSH/RPOP = FIFO); leases live in a sorted set
+    scored by expiry time. Requires the optional `redis` package.
+    """
+    def __init__(self, url, prefix='yta'):
+        self.client = redis.Redis.from_url(url, decode_responses=True)
+        self.prefix = prefix
+        self.leases_key = f"{prefix}:leases"
+        self._lease = self.client.register_script(_LEASE_LUA)
+        self._requeue = self.client.register_script(_REQUEUE_LUA)
+        self._heartbeat = self.client.register_script(_HEARTBEAT_LUA)
+        self._complete = self.client.register_script(_COMPLETE_LUA)
+
+    def _job_key(self, job_id):
+        return f"{self.prefix}:job:{job_id}"
+
+    def enqueue(self, stage, payload, max_attempts=None):
+        job_id = uuid.uuid4().hex
+        pipe = self.client.pipeline()
+        pipe.hset(self._job_key(job_id), mapping={
+            'stage': stage, 'payload': json.dumps(payload), 'status': 'queued', 'attempts': 0,
+            'max_attempts': max_attempts or Config.BROKER_MAX_ATTEMPTS, 'created_at': time.time(),
+        })
+        pipe.lpush(f"{self.prefix}:queue:{stage}", job_id)
+        pipe.execute()
+        logger.info(f"Enqueued {stage} job {job_id}")
+        return job_id
+
+    def lease(self, worker_id, stages, lease_seconds):
+        now = time.time()
+        for job_id in self.client.zrangebyscore(self.leases_key, '-inf', now):
+            if self._requeue(keys=[self.leases_key], args=[job_id, self.prefix, 'lease expired']):
+                logger.warning(f"Lease on job {job_id} expired, re-delivering")
+
+        for stage in stages:
+            job_id = self._lease(keys=[f"{self.prefix}:queue:{stage}", self.leases_key],
+                                 args=[now + lease_seconds, worker_id, self.prefix])
+            if job_id:
+                job = self.client.hgetall(self._job_key(job_id))
+                return LeasedJob(job_id, job['stage'], json.loads(job['payload']), int(job['attempts']))
+        return None
+
+    def heartbeat(self, job_id, worker_id, lease_seconds):
+        return bool(self._heartbeat(keys=[self.leases_key],
+                                    args=[job_id, worker_id, self.prefix, time.time() + lease_seconds]))
+
+    def complete(self, job_id, worker_id, result=None, follow_up=None):
+        next_id, next_stage, next_payload = '', '', ''
+        if follow_up:
+            next_id, next_stage, next_payload = uuid.uuid4().hex, follow_up[0], json.dumps(follow_up[1])
+        return bool(self._complete(keys=[self.leases_key], args=[
+            job_id, worker_id, self.prefix, json.dumps(result), next_id, next_stage, next_payload,
+            Config.BROKER_MAX_ATTEMPTS, time.time()]))
+
+    def fail(self, job_id, worker_id, error):
+        if self.client.hget(self._job_key(job_id), 'worker') == worker_id:
+            self._requeue(keys=[self.leases_key], args=[job_id, self.prefix, str(error)])
+
+    def register_worker(self, worker_id, stages):
+        self.client.set(f"{self.prefix}:worker:{worker_id}", ",".join(stages), ex=3 * Config.BROKER_LEASE_SECONDS)
+
+    def stats(self):
+        jobs = {}
+        for key in self.client.scan_iter(f"{self.prefix}:job:*"):
+            stage, status = self.client.hmget(key, 'stage', 'status')
+            jobs[f"{stage}:{status}"] = jobs.get(f"{stage}:{status}", 0) + 1
+        workers = []
+        for key in self.client.scan_iter(f"{self.prefix}:worker:*"):
+            workers.append({'id': key.rsplit(':', 1)[1], 'stages': (self.client.get(key) or '').split(',')})
+        return {'jobs': jobs, 'workers': workers}
+
+def get_broker(url=None):
+    """
+    Build a broker from a URL: redis://host:6379/0 or sqlite:///path/to/broker.db
+    (a bare path is treated as SQLite).
+    """
+    url = url or Config.BROKER_URL
+    if url.startswith(('redis://', 'rediss://', 'unix://')):
+        return RedisBroker(url)
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteBroker(url)
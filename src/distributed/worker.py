@@ -0,0 +1,94 @@
+import logging
+import os
+import socket
+import threading
+import time
+from config.settings import Config
+from src.pipeline.stages import STAGES
+
+logger = logging.getLogger(__name__)
+
+class Coordinator:
+    """Creates jobs and puts their first stage on the broker. Does no rendering itself."""
+    def __init__(self, broker, pipeline):
+        self.broker = broker
+        self.pipeline = pipeline
+
+    def submit_cycle(self, video_format=None):
+        job = self.pipeline.new_job(video_format)
+        self.broker.enqueue(STAGES[0], job)
+        logger.info(f"Submitted job {job['job_id']}")
+        return job['job_id']
+
+class RenderWorker:
+    """
+    Pulls stage jobs from the broker and executes them.
+    While a stage runs, a background thread renews the lease; if the worker dies
+    the lease expires and the broker re-delivers the stage to another worker.
+    On success the next stage is enqueued atomically with the completion.
+    """
+    def __init__(self, broker, pipeline, stages=None, worker_id=None,
+                 lease_seconds=None, poll_interval=5):
+        self.broker = broker
+        self.pipeline = pipeline
+        self.stages = stages or STAGES
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}"
+        self.lease_seconds = lease_seconds or Config.BROKER_LEASE_SECONDS
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+
+    def stop(self):
+        self._stop.set()
+
+    def run(self, max_jobs=None):
+        logger.info(f"Worker {self.worker_id} serving stages: {', '.join(self.stages)}")
+        processed = 0
+        last_registered = 0
+        while not self._stop.is_set() and (max_jobs is None or processed < max_jobs):
+            if time.time() - last_registered > self.lease_seconds / 3:
+                self.broker.register_worker(self.worker_id, self.stages)
+                last_registered = time.time()
+
+            leased = self.broker.lease(self.worker_id, self.stages, self.lease_seconds)
+            if not leased:
+                self._stop.wait(self.poll_interval)
+                continue
+
+            self.execute(leased)
+            processed += 1
+        logger.info(f"Worker {self.worker_id} stopped after {processed} jobs.")
+
+    def execute(self, leased):
+        logger.info(f"Worker {self.worker_id} running {leased}")
+        lost = threading.Event()
+        done = threading.Event()
+
+        def heartbeat():
+            while not done.wait(self.lease_seconds / 3):
+                if not self.broker.heartbeat(leased.job_id, self.worker_id, self.lease_seconds):
+                    logger.warning(f"Lost lease on job {leased.job_id}, result will be discarded")
+                    lost.set()
+                    return
+
+        beat = threading.Thread(target=heartbeat, daemon=True)
+        beat.start()
+        try:
+            job = self.pipeline.run_stage(leased.stage, leased.payload)
+        except Exception as e:
+            done.set()
+            beat.join()
+            logger.error(f"Stage '{leased.stage}' of job {leased.payload.get('job_id')} failed: {e}", exc_info=True)
+            if not lost.is_set():
+                self.broker.fail(leased.job_id, self.worker_id, e)
+            return False
+        done.set()
+        beat.join()
+
+        next_stage = self.pipeline.next_stage(leased.stage)
+        follow_up = (next_stage, job) if next_stage else None
+        if not self.broker.complete(leased.job_id, self.worker_id, result=job, follow_up=follow_up):
+            logger.warning(f"Job {leased.job_id} was re-delivered elsewhere, discarding result")
+            return False
+        logger.info(f"Stage '{leased.stage}' of job {job['job_id']} complete"
+                    + (f", queued '{next_stage}'" if next_stage else ""))
+        return True
@@ -0,0 +1,136 @@
+import logging
+import hashlib
+import json
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+_digest_cache = {}
+_digest_lock = threading.Lock()
+
+def file_digest(path):
+    """
+    SHA-256 of a file. Cached by (path, size, mtime) so unchanged files are only hashed once per process.
+    """
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+    with _digest_lock:
+        if key in _digest_cache:
+            return _digest_cache[key]
+
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    with _digest_lock:
+        _digest_cache[key] = digest.hexdigest()
+    return _digest_cache[key]
+
+class JobManifest:
+    """
+    manifest.json in a job directory.
+    Records, per stage, a hash of the stage's inputs, the job fields it produced and
+    the size/mtime/SHA-256 of every output file. A stage whose inputs are unchanged
+    and whose outputs still verify is skipped when the job is retried.
+    """
+    FILENAME = "manifest.json"
+
+    def __init__(self, job_dir):
+        self.job_dir = job_dir
+        self.path = os.path.join(job_dir, self.FILENAME)
+        self.data = self._load()
+
+    def _load(self):
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {'status': 'running', 'stages': {}, 'job': None}
+        except ValueError:
+            logger.warning(f"Corrupt manifest {self.path}, starting fresh")
+            return {'status': 'running', 'stages': {}, 'job': None}
+
+    def save(self):
+        self.data['updated_at'] = time.time()
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self.data, f, indent=2)
+        os.replace(tmp_path, self.path)  # Atomic: a crash never leaves a half-written manifest
+
+    @property
+    def job(self):
+        return self.data.get('job')
+
+    @property
+    def status(self):
+        return self.data.get('status')
+
+    def completed(self, stage, inputs_hash):
+        """Return the stage's recorded job updates if it can be skipped, else None."""
+        record = self.data['stages'].get(stage)
+        if not record or record.get('status') != 'done' or record.get('inputs_hash') != inputs_hash:
+            return None
+        for name, expected in record.get('outputs', {}).items():
+            if not self._verify(expected):
+                logger.info(f"Output '{name}' of stage '{stage}' is missing or changed, re-running")
+                return None
+        return record['updates']
+
+    def _verify(self, expected):
+        # Stored relative to the job directory so it verifies on any node sharing assets/
+        path = os.path.join(self.job_dir, expected['file'])
+        if not os.path.exists(path):
+            return False
+        stat = os.stat(path)
+        if stat.st_size != expected['size']:
+            return False
+        if stat.st_mtime_ns == expected['mtime_ns']:
+            return True
+        # Touched but possibly identical: fall back to the content hash
+        return file_digest(path) == expected['sha256']
+
+    def attempts(self, stage):
+        """Times the stage was started since it last succeeded."""
+        return self.data['stages'].get(stage, {}).get('attempts', 0)
+
+    def record_start(self, stage):
+        record = self.data['stages'].get(stage, {})
+        attempts = 0 if record.get('status') == 'done' else record.get('attempts', 0)
+        self.data['stages'][stage] = {'status': 'running', 'attempts': attempts + 1, 'started_at': time.time()}
+        self.data['status'] = 'running'
+        self.save()
+
+    def record_success(self, stage, inputs_hash, updates, output_paths, job):
+        outputs = {}
+        for name, path in output_paths.items():
+            stat = os.stat(path)
+            outputs[name] = {'file': os.path.relpath(path, self.job_dir), 'size': stat.st_size,
+                             'mtime_ns': stat.st_mtime_ns, 'sha256': file_digest(path)}
+        self.data['stages'][stage] = {
+            'status': 'done',
+            'inputs_hash': inputs_hash,
+            'updates': updates,
+            'outputs': outputs,
+            'attempts': self.attempts(stage),
+            'finished_at': time.time(),
+        }
+        self.data['job'] = job
+        self.data['status'] = 'running'
+        self.data.pop('failed_stage', None)
+        self.data.pop('error', None)
+        self.save()
+
+    def record_failure(self, stage, error, job):
+        self.data['stages'][stage] = {'status': 'failed', 'error': str(error), 'attempts': self.attempts(stage),
+                                      'finished_at': time.time()}
+        self.data['job'] = job
+        self.data['status'] = 'failed'
+        self.data['failed_stage'] = stage
+        self.data['error'] = str(error)
+        self.save()
+
+    def mark(self, status):
+        self.data['status'] = status
+        self.save()
@@ -0,0 +1,276 @@
+import logging
+import hashlib
+import json
+import os
+import shutil
+import time
+import uuid
+from config.settings import Config
+from src.pipeline.manifest import JobManifest, file_digest
+from src.analytics.performance_store import get_performance_store
+
+logger = logging.getLogger(__name__)
+
+# Stage order for one video. Every stage takes the job dict and returns updates to it,
+# so a job can be handed between processes (or machines) after any stage.
+STAGES = ['topic', 'script', 'audio', 'render', 'publish']
+
+# Job fields each stage reads. A stage is re-run when any of them change.
+STAGE_INPUTS = {
+    'topic': ['format'],
+    'script': ['format', 'topic'],
+    'audio': ['script'],
+    'render': ['format', 'topic', 'query', 'script', 'audio'],
+    'publish': ['format', 'topic', 'video', 'thumbnail'],
+}
+
+# Job fields that name files in the job directory. Their content hash is part of the
+# inputs of downstream stages and they are verified before a stage is skipped.
+FILE_FIELDS = ['audio', 'video', 'thumbnail']
+
+class StageError(Exception):
+    """Raised when a stage cannot produce its outputs."""
+
+class Pipeline:
+    """
+    The video pipeline split into resumable stages.
+    Job state is a JSON-serializable dict; files live in a per-job directory under
+    ASSETS_DIR/jobs and are referenced by name relative to it, so any node that
+    shares ASSETS_DIR can pick up the next stage.
+    Every stage is checkpointed in the job's manifest, so retrying a job skips the
+    stages whose outputs are still valid and resumes at the first one that failed.
+    """
+    def __init__(self, registry):
+        self.registry = registry
+        self._prefetch = {}  # job_id -> clip stream started during the audio stage
+
+    def new_job(self, video_format=None):
+        job_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:6]}"
+        job = {'job_id': job_id, 'format': video_format or Config.VIDEO_FORMAT, 'created_at': time.time()}
+        os.makedirs(self.job_dir(job), exist_ok=True)
+        manifest = JobManifest(self.job_dir(job))
+        manifest.data['job'] = job
+        manifest.save()
+        return job
+
+    def _manifests(self):
+        """Manifests of all jobs on disk, oldest first."""
+        jobs_dir = os.path.join(Config.ASSETS_DIR, 'jobs')
+        if not os.path.isdir(jobs_dir):
+            return
+        for job_id in sorted(os.listdir(jobs_dir)):
+            if os.path.exists(os.path.join(jobs_dir, job_id, JobManifest.FILENAME)):
+                yield job_id, JobManifest(os.path.join(jobs_dir, job_id))
+
+    def find_resumable(self, until_stage=None):
+        """
+        Oldest unfinished job whose unfinished stages have attempts left, or None.
+        until_stage: only consider jobs that have not finished this stage yet.
+        Its manifest's job dict can be passed straight to run().
+        """
+        until_stage = until_stage or STAGES[-1]
+        for job_id, manifest in self._manifests():
+            if manifest.status in ('complete', 'abandoned') or not manifest.job:
+                continue
+            if manifest.data['stages'].get(until_stage, {}).get('status') == 'done':
+                continue
+            pending = STAGES[:STAGES.index(until_stage) + 1]
+            if self._out_of_attempts(job_id, manifest, pending):
+                continue
+            return manifest.job
+        return None
+
+    def ready_jobs(self):
+        """
+        Rendered jobs waiting to be published that have publish attempts left, oldest first.
+        Jobs whose last publish failed come after the rest, so they cannot hold up the buffer.
+        """
+        ready, retries = [], []
+        for job_id, manifest in self._manifests():
+            stages = manifest.data['stages']
+            if manifest.status in ('complete', 'abandoned') or not manifest.job:
+                continue
+            if stages.get('render', {}).get('status') != 'done' or stages.get('publish', {}).get('status') == 'done':
+                continue
+            if self._out_of_attempts(job_id, manifest, ['publish']):
+                continue
+            (retries if manifest.status == 'failed' else ready).append(manifest.job)
+        return ready + retries
+
+    def _out_of_attempts(self, job_id, manifest, stages):
+        """
+        Abandon the job if one of `stages` that has not succeeded yet was tried
+        JOB_MAX_ATTEMPTS times. Counted per stage, so retries of a flaky render do
+        not use up the upload's attempts.
+        """
+        exhausted = [stage for stage in stages
+                     if manifest.data['stages'].get(stage, {}).get('status') != 'done'
+                     and manifest.attempts(stage) >= Config.JOB_MAX_ATTEMPTS]
+        if not exhausted:
+            return False
+        logger.warning(f"Giving up on job {job_id} after {manifest.attempts(exhausted[0])} attempts "
+                       f"at stage '{exhausted[0]}' (last error: {manifest.data.get('error')})")
+        manifest.mark('abandoned')
+        return True
+
+    def prune_jobs(self, days=None):
+        """Delete directories of finished or abandoned jobs older than `days`."""
+        days = Config.JOB_RETENTION_DAYS if days is None else days
+        jobs_dir = os.path.join(Config.ASSETS_DIR, 'jobs')
+        if not os.path.isdir(jobs_dir):
+            return
+        cutoff = time.time() - days * 86400
+        for job_id in os.listdir(jobs_dir):
+            job_dir = os.path.join(jobs_dir, job_id)
+            manifest = JobManifest(job_dir)
+            if manifest.status in ('complete', 'abandoned') and manifest.data.get('updated_at', 0) < cutoff:
+                shutil.rmtree(job_dir, ignore_errors=True)
+
+    def job_dir(self, job):
+        return os.path.join(Config.ASSETS_DIR, 'jobs', job['job_id'])
+
+    def path(self, job, name):
+        return os.path.join(self.job_dir(job), name)
+
+    def next_stage(self, stage):
+        index = STAGES.index(stage) + 1
+        return STAGES[index] if index < len(STAGES) else None
+
+    def run_stage(self, stage, job, prefetch=False):
+        """
+        Run one stage (or skip it if its checkpoint is still valid) and return the updated job.
+        prefetch: the render stage will run next in this process, so the audio stage may
+        start downloading footage for it. Workers serving single stages leave this off.
+        """
+        if stage not in STAGES:
+            raise ValueError(f"Unknown stage: {stage}")
+        os.makedirs(self.job_dir(job), exist_ok=True)
+        manifest = JobManifest(self.job_dir(job))
+        inputs_hash = self._inputs_hash(stage, job)
+
+        cached = manifest.completed(stage, inputs_hash)
+        if cached is not None:
+            logger.info(f"[{job['job_id']}] Stage '{stage}' already done, skipping.")
+            return dict(job, **cached)
+
+        logger.info(f"[{job['job_id']}] Running stage '{stage}'...")
+        manifest.record_start(stage)
+        if prefetch and stage == 'audio':
+            # Start fetching footage now so downloads overlap TTS; render picks the stream up
+            self._prefetch[job['job_id']] = self._clip_stream(job)
+        try:
+            updates = getattr(self, f"_stage_{stage}")(job) or {}
+        except Exception as e:
+            self._discard_prefetch(job)
+            manifest.record_failure(stage, e, job)
+            raise
+
+        job = dict(job, **updates)
+        outputs = {field: self.path(job, updates[field]) for field in FILE_FIELDS if field in updates}
+        manifest.record_success(stage, inputs_hash, updates, outputs, job)
+        if stage == STAGES[-1]:
+            manifest.mark('complete')
+        return job
+
+    def run(self, job, stages=None):
+        """Run a job from the start; stages finished by an earlier attempt are skipped."""
+        stages = stages or STAGES
+        try:
+            for stage in stages:
+                job = self.run_stage(stage, job, prefetch='render' in stages)
+        finally:
+            # Render was skipped or never reached: nothing will consume the stream
+            self._discard_prefetch(job)
+        return job
+
+    def _discard_prefetch(self, job):
+        clips = self._prefetch.pop(job['job_id'], None)
+        if hasattr(clips, 'close'):
+            clips.close()
+
+    def _inputs_hash(self, stage, job):
+        inputs = {}
+        for field in STAGE_INPUTS[stage]:
+            value = job.get(field)
+            if field in FILE_FIELDS and value:
+                path = self.path(job, value)
+                # Content, not name: regenerated audio must invalidate the render
+                value = file_digest(path) if os.path.exists(path) else None
+            inputs[field] = value
+        return hashlib.sha256(json.dumps(inputs, sort_keys=True).encode()).hexdigest()
+
+    def _stage_topic(self, job):
+        logger.info("Step 1: Analyzing trends...")
+        trend_analyzer = self.registry.get('trend_analyzer')
+        keyword = trend_analyzer.select_keyword()
+        topic = trend_analyzer.select_topic(keyword=keyword)
+        if not topic:
+            raise StageError("No topic selected")
+        # Footage is searched and indexed by the keyword; the topic is a template around it
+        return {'topic': topic, 'keyword': keyword, 'query': keyword}
+
+    def _stage_script(self, job):
+        logger.info(f"Step 2: Generating content for '{job['topic']}'...")
+        duration_type = "long" if job['format'] == "long" else "short"
+        script = self.registry.get('script_gen').generate_script(job['topic'], duration_type=duration_type)
+        return {'script': script}
+
+    def _stage_audio(self, job):
+        audio_path = self.path(job, "audio.mp3")
+        if not self.registry.get('audio_gen').generate_audio(job['script'], audio_path):
+            raise StageError("Audio generation failed")
+        return {'audio': "audio.mp3"}
+
+    def _stage_render(self, job):
+        logger.info("Step 3: Producing video...")
+        video_editor = self.registry.get('video_editor')
+        clips = self._prefetch.pop(job['job_id'], None) or self._clip_stream(job)
+        audio_path = self.path(job, job['audio'])
+        video_path = self.path(job, "video.mp4")
+
+        if job['format'] == "long":
+            final_video = video_editor.create_long(audio_path, list(clips), job['script'], video_path)
+        else:
+            final_video = video_editor.create_short_streaming(audio_path, clips, job['script'], video_path)
+        if not final_video or not os.path.exists(final_video):
+            raise StageError("Video generation failed")
+
+        self.registry.get('thumb_gen').create_thumbnail(job['topic'], output_path=self.path(job, "thumbnail.jpg"),
+                                                        video_path=final_video, timestamp=Config.THUMBNAIL_TIMESTAMP)
+        return {'video': "video.mp4", 'thumbnail': "thumbnail.jpg"}
+
+    def _stage_publish(self, job):
+        logger.info("Step 4: Uploading...")
+        uploader = self.registry.get('uploader')
+        topic = job['topic']
+        # Generate description
+        if job['format'] == "long":
+            description = f"An AI generated video about {topic}.\n\n#ai #facts"
+            tags = ["ai", "facts", topic.split()[0]]
+        else:
+            description = f"An AI generated video about {topic}.\n\n#shorts #ai #facts"
+            tags = ["shorts", "ai", "facts", topic.split()[0]]
+
+        thumbnail_path = self.path(job, job['thumbnail']) if job.get('thumbnail') else None
+        video_id = uploader.publish(self.path(job, job['video']), topic, description, tags,
+                                    thumbnail_path=thumbnail_path, playlist_id=Config.YOUTUBE_PLAYLIST_ID)
+        if not uploader.youtube:
+            # Retry authentication next time instead of caching a dead client
+            self.registry.reset('uploader')
+        if not video_id:
+            raise StageError("Upload failed")
+        try:
+            get_performance_store().track(video_id, topic, job.get('keyword'), job['format'])
+        except Exception as e:
+            # The upload went through; failing here would make a retry upload it again
+            logger.error(f"Could not track {video_id} for analytics: {e}")
+        return {'video_id': video_id}
+
+    def _clip_stream(self, job):
+        """Clip iterable for the job: indexed clips first, Pexels for the shortfall."""
+        visual_gen = self.registry.get('visual_gen')
+        target_duration = self.registry.get('audio_gen').estimate_duration(job['script'])
+        if job['format'] == "long":
+            return visual_gen.stream_stock_videos(job['query'], count=8, orientation='landscape',
+                                                  target_duration=target_duration)
+        return visual_gen.stream_stock_videos(job['query'], count=3, target_duration=target_duration)
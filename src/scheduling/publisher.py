@@ -0,0 +1,155 @@
+import logging
+import math
+import threading
+import time
+from datetime import datetime
+from config.settings import Config
+from src.pipeline.stages import STAGES
+from src.scheduling.quota import get_quota_tracker, PRODUCTION_COSTS, PUBLISH_COSTS
+from src.analytics.performance_store import get_performance_store
+
+logger = logging.getLogger(__name__)
+
+# Ready videos tried per publish slot: one bad video cannot cost the slot, but a
+# systemic failure (e.g. revoked auth) does not burn an upload's quota per video
+PUBLISH_TRIES_PER_SLOT = 2
+
+def parse_publish_times(value):
+    """"09:00,17:30" -> [(9, 0), (17, 30)], sorted."""
+    times = []
+    for item in filter(None, (part.strip() for part in (value or "").split(','))):
+        hour, minute = item.split(':')
+        times.append((int(hour), int(minute)))
+    return sorted(times)
+
+class BufferedScheduler:
+    """
+    Decouples production from publishing.
+    Production (topic -> render) runs ahead whenever the buffer of rendered videos is
+    below target and the API quotas allow it; publish slots just take the oldest ready
+    video, so a slow render never makes a slot late. The target grows with the observed
+    render time so one slot interval is always covered.
+    """
+    def __init__(self, pipeline, quota=None, publish_times=None, buffer_target=None):
+        self.pipeline = pipeline
+        self.quota = quota or get_quota_tracker()
+        self.publish_times = parse_publish_times(Config.PUBLISH_TIMES if publish_times is None else publish_times)
+        self.min_buffer = Config.BUFFER_TARGET if buffer_target is None else buffer_target
+        self.render_seconds = None  # EWMA of topic -> render wall time
+        self._produce_lock = threading.Lock()
+        self._missed_lock = threading.Lock()
+        self._missed_slots = 0
+
+    def slot_interval(self):
+        """Shortest gap between two publish slots, in seconds."""
+        if len(self.publish_times) < 2:
+            return 86400 if self.publish_times else Config.UPLOAD_FREQUENCY_HOURS * 3600
+        minutes = [h * 60 + m for h, m in self.publish_times]
+        gaps = [b - a for a, b in zip(minutes, minutes[1:])] + [minutes[0] + 1440 - minutes[-1]]
+        return min(gaps) * 60
+
+    def buffer_target(self):
+        if not self.render_seconds:
+            return self.min_buffer
+        return max(self.min_buffer, math.ceil(self.render_seconds / self.slot_interval()))
+
+    def produce(self):
+        """Fill the buffer up to target. Returns the number of videos produced."""
+        if not self._produce_lock.acquire(blocking=False):
+            return 0  # Already producing
+        produced = 0
+        try:
+            self.pipeline.prune_jobs()
+            while len(self.pipeline.ready_jobs()) < self.buffer_target():
+                # Never let production eat into the units the next upload needs
+                if not self.quota.can_afford(PRODUCTION_COSTS, reserve=PUBLISH_COSTS):
+                    logger.info("Not enough API quota to produce another video, waiting.")
+                    break
+                job = self.pipeline.find_resumable(until_stage='render')
+                if job:
+                    logger.info(f"Resuming job {job['job_id']}...")
+                else:
+                    job = self.pipeline.new_job()
+
+                started = time.time()
+                try:
+                    self.pipeline.run(job, STAGES[:-1])
+                except Exception as e:
+                    logger.error(f"Production of job {job['job_id']} failed: {e}", exc_info=True)
+                    break
+                elapsed = time.time() - started
+                self.render_seconds = elapsed if self.render_seconds is None else 0.3 * elapsed + 0.7 * self.render_seconds
+                produced += 1
+                logger.info(f"Job {job['job_id']} ready to publish after {elapsed:.0f}s "
+                            f"(buffer {len(self.pipeline.ready_jobs())}/{self.buffer_target()})")
+
+                with self._missed_lock:
+                    missed, self._missed_slots = self._missed_slots, 0
+                for _ in range(missed):
+                    self.publish()
+        finally:
+            self._produce_lock.release()
+        return produced
+
+    def publish(self):
+        """Publish the oldest ready video. Returns the published job, or None."""
+        ready = self.pipeline.ready_jobs()
+        if not ready:
+            logger.warning("Publish slot reached with an empty buffer, publishing as soon as a render finishes.")
+            with self._missed_lock:
+                self._missed_slots += 1
+            self._produce_async()
+            return None
+
+        for job in ready[:PUBLISH_TRIES_PER_SLOT]:
+            if not self.quota.can_afford(PUBLISH_COSTS):
+                logger.warning("Not enough YouTube quota left today to upload, keeping the video for the next slot.")
+                break
+            try:
+                job = self.pipeline.run(job, ['publish'])
+            except Exception as e:
+                logger.error(f"Publishing job {job['job_id']} failed: {e}", exc_info=True)
+                continue
+            logger.info(f"Published job {job['job_id']} ({len(ready) - 1} left in buffer).")
+            self._produce_async()
+            return job
+        # Failed jobs may have been abandoned, leaving room in the buffer
+        self._produce_async()
+        return None
+
+    def collect_analytics(self):
+        """Refresh the performance store that topic selection is weighted by."""
+        store = get_performance_store()
+        # One videos.list per 50 videos, plus the channel totals
+        calls = math.ceil(len(store.tracked()) / 50) + 1
+        if not self.quota.can_afford({'youtube': calls}, reserve=PUBLISH_COSTS):
+            logger.info("Skipping analytics collection to keep quota for uploads.")
+            return None
+        try:
+            return store.collect(self.pipeline.registry.get('uploader'), Config.ANALYTICS_RECORD_PATH)
+        except Exception as e:
+            logger.error(f"Analytics collection failed: {e}", exc_info=True)
+            return None
+
+    def _produce_async(self):
+        threading.Thread(target=self.produce, name="produce", daemon=True).start()
+
+    def start(self):
+        from apscheduler.schedulers.blocking import BlockingScheduler
+
+        scheduler = BlockingScheduler()
+        if self.publish_times:
+            for hour, minute in self.publish_times:
+                scheduler.add_job(self.publish, 'cron', hour=hour, minute=minute, misfire_grace_time=3600)
+            logger.info(f"Publishing at {', '.join(f'{h:02d}:{m:02d}' for h, m in self.publish_times)}.")
+        else:
+            # First slot right away, as the fixed-interval scheduler did
+            scheduler.add_job(self.publish, 'interval', hours=Config.UPLOAD_FREQUENCY_HOURS,
+                              next_run_time=datetime.now(), misfire_grace_time=3600)
+            logger.info(f"Publishing every {Config.UPLOAD_FREQUENCY_HOURS} hours.")
+        scheduler.add_job(self.produce, 'interval', minutes=Config.PRODUCE_CHECK_MINUTES,
+                          next_run_time=datetime.now(), max_instances=1, coalesce=True)
+        scheduler.add_job(self.collect_analytics, 'interval', hours=Config.ANALYTICS_COLLECT_HOURS,
+                          max_instances=1, coalesce=True)
+        logger.info(f"Quota remaining: {self.quota.summary()}")
+        scheduler.start()
@@ -0,0 +1,107 @@
+import logging
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config.settings import Config
+
+try:
+    from zoneinfo import ZoneInfo
+    PACIFIC = ZoneInfo("America/Los_Angeles")
+except Exception:  # No tz database available
+    PACIFIC = timezone(timedelta(hours=-8))
+
+logger = logging.getLogger(__name__)
+
+# YouTube Data API v3 unit costs
+YOUTUBE_COSTS = {
+    'videos.insert': 1600,
+    'thumbnails.set': 50,
+    'playlistItems.insert': 50,
+    'videos.update': 50,
+    'list': 1,
+}
+
+# Expected usage per video, used to decide whether a job can start at all
+PRODUCTION_COSTS = {'youtube': YOUTUBE_COSTS['list'], 'gemini': 1, 'pexels': 1}
+PUBLISH_COSTS = {'youtube': YOUTUBE_COSTS['videos.insert'] + YOUTUBE_COSTS['thumbnails.set']
+                 + (YOUTUBE_COSTS['playlistItems.insert'] if Config.YOUTUBE_PLAYLIST_ID else 0)}
+
+def _window_start(window, now):
+    """Start (epoch seconds) of the quota window containing `now`."""
+    if window == 'pacific_day':
+        # YouTube quotas reset at midnight Pacific time
+        local = datetime.fromtimestamp(now, PACIFIC)
+        return local.replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+    seconds = {'minute': 60, 'hour': 3600, 'day': 86400, 'month': 30 * 86400}[window]
+    return now - seconds  # Rolling window
+
+class QuotaTracker:
+    """
+    Persistent per-service API usage ledger.
+    Each service has one or more (limit, window) budgets; a request is affordable
+    only if it fits every window.
+    """
+    def __init__(self, db_path=None, budgets=None):
+        self.db_path = db_path or os.path.join(Config.STATE_DIR, "quota.db")
+        self.budgets = budgets or {
+            'youtube': [(Config.QUOTA_YOUTUBE_DAILY, 'pacific_day')],
+            'gemini': [(Config.QUOTA_GEMINI_PER_MINUTE, 'minute'), (Config.QUOTA_GEMINI_DAILY, 'day')],
+            'pexels': [(Config.QUOTA_PEXELS_HOURLY, 'hour'), (Config.QUOTA_PEXELS_MONTHLY, 'month')],
+        }
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock, self._conn:
+            self._conn.execute("CREATE TABLE IF NOT EXISTS usage (ts REAL, service TEXT, units INTEGER)")
+            self._conn.execute("CREATE INDEX IF NOT EXISTS usage_service_ts ON usage (service, ts)")
+            # Nothing older than the longest window is ever needed
+            self._conn.execute("DELETE FROM usage WHERE ts < ?", (time.time() - 32 * 86400,))
+
+    def consume(self, service, units=1):
+        with self._lock, self._conn:
+            self._conn.execute("INSERT INTO usage VALUES (?, ?, ?)", (time.time(), service, units))
+
+    def used(self, service, window, now=None):
+        now = now or time.time()
+        with self._lock:
+            row = self._conn.execute("SELECT COALESCE(SUM(units), 0) FROM usage WHERE service = ? AND ts >= ?",
+                                     (service, _window_start(window, now))).fetchone()
+        return row[0]
+
+    def remaining(self, service, now=None):
+        """Smallest headroom across the service's windows (None if the service is unbudgeted)."""
+        budgets = self.budgets.get(service)
+        if not budgets:
+            return None
+        return min(limit - self.used(service, window, now) for limit, window in budgets)
+
+    def can_afford(self, costs, reserve=None):
+        """
+        costs / reserve: {service: units}. `reserve` is held back for higher-priority
+        work (e.g. the uploads already scheduled today).
+        """
+        for service, units in costs.items():
+            remaining = self.remaining(service)
+            if remaining is None:
+                continue
+            needed = units + (reserve or {}).get(service, 0)
+            if remaining < needed:
+                logger.info(f"Quota: {service} has {remaining} units left, need {needed}")
+                return False
+        return True
+
+    def summary(self):
+        return {service: self.remaining(service) for service in self.budgets}
+
+_tracker = None
+_tracker_lock = threading.Lock()
+
+def get_quota_tracker():
+    """Process-wide tracker shared by every API client."""
+    global _tracker
+    with _tracker_lock:
+        if _tracker is None:
+            _tracker = QuotaTracker()
+        return _tracker
@@ -1,38 +1,70 @@
 import logging
-from pytrends.request import TrendReq
-from googleapiclient.discovery import build
 from config.settings import Config
+from src.core.lazy_imports import lazy_import
+from src.scheduling.quota import get_quota_tracker, YOUTUBE_COSTS
+from src.analytics.performance_store import get_performance_store
 import random
 
+pytrends_request = lazy_import('pytrends.request')
+discovery = lazy_import('googleapiclient.discovery')
+
 logger = logging.getLogger(__name__)
 
 class TrendAnalyzer:
     def __init__(self):
-        self.pytrends = TrendReq(hl='en-US', tz=360)
+        self.pytrends = pytrends_request.TrendReq(hl='en-US', tz=360)
         self.youtube = None
         if Config.YOUTUBE_API_KEY:
-            self.youtube = build('youtube', 'v3', developerKey=Config.YOUTUBE_API_KEY)
+            self.youtube = discovery.build('youtube', 'v3', developerKey=Config.YOUTUBE_API_KEY)
         else:
             logger.warning("YOUTUBE_API_KEY not found. YouTube specific trend data will be limited.")
 
-    def get_google_trends(self, keywords=['technology', 'AI', 'future', 'gadgets']):
+    def get_keyword_interest(self, keywords):
         """
-        Fetch interest over time for given keywords to find rising topics.
+        Latest Google Trends interest (0-100) per keyword, or {} if unavailable.
         """
         try:
             logger.info(f"Fetching Google Trends for: {keywords}")
             self.pytrends.build_payload(keywords, cat=0, timeframe='now 7-d', geo='', gprop='youtube')
             data = self.pytrends.interest_over_time()
-            if not data.empty:
-                # Find the keyword with the highest recent interest
-                latest_data = data.iloc[-1]
-                top_keyword = latest_data.idxmax()
-                logger.info(f"Top trending keyword: {top_keyword}")
-                return top_keyword
-            return random.choice(keywords)
+            if data.empty:
+                return {}
+            latest_data = data.iloc[-1]
+            return {keyword: float(latest_data[keyword]) for keyword in keywords if keyword in latest_data}
         except Exception as e:
             logger.error(f"Error fetching Google Trends: {e}")
-            return random.choice(keywords)
+            return {}
+
+    def get_google_trends(self, keywords=['technology', 'AI', 'future', 'gadgets']):
+        """
+        Fetch interest over time for given keywords to find rising topics.
+        """
+        interest = self.get_keyword_interest(keywords)
+        if interest:
+            # Find the keyword with the highest recent interest
+            top_keyword = max(interest, key=interest.get)
+            logger.info(f"Top trending keyword: {top_keyword}")
+            return top_keyword
+        return random.choice(keywords)
+
+    def select_keyword(self, niche_keywords=None):
+        """
+        Trending interest weighted by how earlier videos on each keyword performed.
+        """
+        if niche_keywords is None:
+            niche_keywords = ['Artificial Intelligence', 'Space Exploration', 'Coding', 'Tech News']
+
+        interest = self.get_keyword_interest(niche_keywords)
+        weights = get_performance_store().keyword_weights(niche_keywords)
+        if not interest:
+            return random.choices(niche_keywords, weights=[weights[k] for k in niche_keywords])[0]
+
+        # +1 so past performance still decides when every keyword is flat
+        scores = {k: (interest.get(k, 0) + 1) * weights[k] for k in niche_keywords}
+        keyword = max(scores, key=scores.get)
+        logger.info(f"Top keyword: {keyword} (interest {interest.get(keyword, 0):.0f}, "
+                    f"performance weight {weights[keyword]:.2f})")
+        return keyword
 
     def get_youtube_trends(self, region_code='US', max_results=5):
         """
@@ -49,6 +81,7 @@ class TrendAnalyzer:
                 regionCode=region_code,
                 maxResults=max_results
             )
+            get_quota_tracker().consume('youtube', YOUTUBE_COSTS['list'])
             response = request.execute()
             
             trends = []
@@ -61,15 +94,12 @@ class TrendAnalyzer:
             logger.error(f"Error fetching YouTube Trends: {e}")
             return []
 
-    def select_topic(self, niche_keywords=None):
+    def select_topic(self, niche_keywords=None, keyword=None):
         """
         Main method to decide on a video topic.
         """
-        if niche_keywords is None:
-            niche_keywords = ['Artificial Intelligence', 'Space Exploration', 'Coding', 'Tech News']
-            
-        # 1. Try to get a specific trending keyword from Google Trends
-        trending_keyword = self.get_google_trends(niche_keywords)
+        # 1. Pick a trending keyword that has done well on this channel
+        trending_keyword = keyword or self.select_keyword(niche_keywords)
         
         # 2. Get general YouTube trends to see if we can piggyback (optional context)
         yt_trends = self.get_youtube_trends()
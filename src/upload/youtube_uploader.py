@@ -1,19 +1,29 @@
 import logging
 import os
 import pickle
-from google_auth_oauthlib.flow import InstalledAppFlow
-from google.auth.transport.requests import Request
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+import concurrent.futures
 from config.settings import Config
+from src.core.lazy_imports import lazy_import
+from src.scheduling.quota import get_quota_tracker, YOUTUBE_COSTS
+
+oauth_flow = lazy_import('google_auth_oauthlib.flow')
+auth_requests = lazy_import('google.auth.transport.requests')
+discovery = lazy_import('googleapiclient.discovery')
+http = lazy_import('googleapiclient.http')
+httplib2 = lazy_import('httplib2')
+google_auth_httplib2 = lazy_import('google_auth_httplib2')
 
 logger = logging.getLogger(__name__)
 
 class YouTubeUploader:
     def __init__(self):
         self.SCOPES = ['https://www.googleapis.com/auth/youtube.upload', 'https://www.googleapis.com/auth/youtube.readonly']
+        if Config.YOUTUBE_PLAYLIST_ID:
+            # playlistItems.insert is not covered by the upload scope
+            self.SCOPES.append('https://www.googleapis.com/auth/youtube')
         self.client_secrets_file = os.path.join(Config.BASE_DIR, '..', 'client_secrets.json')
         self.token_file = os.path.join(Config.BASE_DIR, '..', 'token.pickle')
+        self.credentials = None
         self.youtube = self._authenticate()
 
     def _authenticate(self):
@@ -21,16 +31,19 @@ class YouTubeUploader:
         if os.path.exists(self.token_file):
             with open(self.token_file, 'rb') as token:
                 creds = pickle.load(token)
+            if creds and not creds.has_scopes(self.SCOPES):
+                logger.info("Stored token lacks required scopes, re-authenticating.")
+                creds = None
         
         if not creds or not creds.valid:
             if creds and creds.expired and creds.refresh_token:
-                creds.refresh(Request())
+                creds.refresh(auth_requests.Request())
             else:
                 if not os.path.exists(self.client_secrets_file):
                     logger.error("client_secrets.json not found. Cannot authenticate.")
                     return None
                 
-                flow = InstalledAppFlow.from_client_secrets_file(
+                flow = oauth_flow.InstalledAppFlow.from_client_secrets_file(
                     self.client_secrets_file, self.SCOPES)
                 
                 # Generate and print URL for manual access if browser fails
@@ -47,7 +60,34 @@ class YouTubeUploader:
             with open(self.token_file, 'wb') as token:
                 pickle.dump(creds, token)
 
-        return build('youtube', 'v3', credentials=creds)
+        self.credentials = creds
+        return discovery.build('youtube', 'v3', credentials=creds)
+
+    def _new_http(self):
+        """Separate authorized connection: httplib2 objects must not be shared between threads."""
+        return google_auth_httplib2.AuthorizedHttp(self.credentials, http=httplib2.Http())
+
+    def _batch(self, requests):
+        """
+        Executes non-media requests in a single batch HTTP round trip.
+        requests: list of (request, quota_cost). Returns responses in order (None for failures).
+        """
+        responses = [None] * len(requests)
+
+        def callback(request_id, response, exception):
+            if exception is not None:
+                logger.error(f"Batched request {request_id} failed: {exception}")
+                return
+            responses[int(request_id)] = response
+
+        # The API accepts at most 50 calls per batch
+        for offset in range(0, len(requests), 50):
+            batch = self.youtube.new_batch_http_request(callback=callback)
+            for index, (request, cost) in enumerate(requests[offset:offset + 50], start=offset):
+                batch.add(request, request_id=str(index))
+                get_quota_tracker().consume('youtube', cost)
+            batch.execute()
+        return responses
 
     def upload_video(self, file_path, title, description, tags=[], category_id="28"): # 28 is Science & Tech
         if not self.youtube:
@@ -69,7 +109,7 @@ class YouTubeUploader:
             }
         }
 
-        media = MediaFileUpload(file_path, chunksize=-1, resumable=True)
+        media = http.MediaFileUpload(file_path, chunksize=-1, resumable=True)
         
         try:
             request = self.youtube.videos().insert(
@@ -77,6 +117,8 @@ class YouTubeUploader:
                 body=body,
                 media_body=media
             )
+            # Quota is charged per attempt, even if the upload fails
+            get_quota_tracker().consume('youtube', YOUTUBE_COSTS['videos.insert'])
             response = request.execute()
             logger.info(f"Upload Complete! Video ID: {response['id']}")
             return response['id']
@@ -84,6 +126,68 @@ class YouTubeUploader:
             logger.error(f"Upload failed: {e}")
             return None
 
+    def _set_thumbnail(self, video_id, thumbnail_path):
+        request = self.youtube.thumbnails().set(
+            videoId=video_id,
+            media_body=http.MediaFileUpload(thumbnail_path, mimetype='image/jpeg')
+        )
+        get_quota_tracker().consume('youtube', YOUTUBE_COSTS['thumbnails.set'])
+        return request.execute(http=self._new_http())
+
+    def publish(self, file_path, title, description, tags=[], category_id="28",
+                thumbnail_path=None, playlist_id=None):
+        """
+        Uploads the video, then sets the thumbnail and adds it to the playlist in one
+        concurrent wave: the thumbnail (a media upload, which cannot be batched) goes out
+        on its own connection while the remaining calls share a batch request.
+        Follow-up failures are logged but do not fail the publish. Returns the video ID.
+        """
+        video_id = self.upload_video(file_path, title, description, tags, category_id)
+        if not video_id:
+            return None
+
+        with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+            thumbnail = None
+            if thumbnail_path and os.path.exists(thumbnail_path):
+                thumbnail = executor.submit(self._set_thumbnail, video_id, thumbnail_path)
+
+            follow_ups = []
+            if playlist_id:
+                follow_ups.append((self.youtube.playlistItems().insert(
+                    part='snippet',
+                    body={'snippet': {'playlistId': playlist_id,
+                                      'resourceId': {'kind': 'youtube#video', 'videoId': video_id}}}
+                ), YOUTUBE_COSTS['playlistItems.insert']))
+            if follow_ups:
+                try:
+                    self._batch(follow_ups)
+                except Exception as e:
+                    logger.error(f"Playlist update failed: {e}")
+
+            if thumbnail:
+                try:
+                    thumbnail.result()
+                    logger.info(f"Thumbnail set for {video_id}")
+                except Exception as e:
+                    # Custom thumbnails need a verified channel
+                    logger.error(f"Thumbnail upload failed: {e}")
+        return video_id
+
+    def get_video_stats(self, video_ids):
+        """{video_id: {'statistics': ..., 'snippet': ...}}, fetched 50 IDs per call in one batch."""
+        if not self.youtube or not video_ids:
+            return {}
+        requests = []
+        for offset in range(0, len(video_ids), 50):
+            chunk = video_ids[offset:offset + 50]
+            requests.append((self.youtube.videos().list(part="statistics,snippet", id=",".join(chunk)),
+                             YOUTUBE_COSTS['list']))
+        stats = {}
+        for response in self._batch(requests):
+            for item in (response or {}).get('items', []):
+                stats[item['id']] = item
+        return stats
+
     def get_channel_stats(self):
         if not self.youtube:
             return None
@@ -93,7 +197,7 @@ class YouTubeUploader:
                 part="statistics",
                 mine=True
             )
-            response = request.execute()
+            response, = self._batch([(request, YOUTUBE_COSTS['list'])])
             stats = response['items'][0]['statistics']
             logger.info(f"Channel Stats: {stats}")
             return stats
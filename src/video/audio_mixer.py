@@ -0,0 +1,170 @@
+import logging
+import json
+import os
+import re
+import subprocess
+import tempfile
+import threading
+from config.settings import Config
+from src.pipeline.manifest import file_digest
+
+logger = logging.getLogger(__name__)
+
+SILENCE_DETECT = "silencedetect=noise=-50dB:d=0.1"
+SILENCE_PADDING = 0.1 # Seconds of silence kept at either end
+
+class AudioMixer:
+    """
+    Builds the audio half of the final FFmpeg filtergraph: silence trim, EBU R128
+    loudnorm (linear, using cached first-pass measurements) and an optional music
+    bed ducked under the narration with a sidechain compressor. Everything runs
+    inside the render/join command, so there is no extra decode/encode pass.
+    """
+    def __init__(self, cache_path=None):
+        self.enabled = Config.AUDIO_LOUDNORM
+        self.trim = Config.AUDIO_TRIM_SILENCE
+        self.target_i = Config.TARGET_LOUDNESS_LUFS
+        self.target_tp = Config.TARGET_TRUE_PEAK
+        self.target_lra = Config.TARGET_LRA
+        self.music_path = Config.BACKGROUND_MUSIC_PATH
+        self.music_volume_db = Config.MUSIC_VOLUME_DB
+        self.cache_path = cache_path or os.path.join(Config.STATE_DIR, "loudnorm_cache.json")
+        self._cache = None
+        self._lock = threading.Lock()
+
+        if self.music_path and not os.path.exists(self.music_path):
+            logger.warning(f"Background music not found: {self.music_path}")
+            self.music_path = None
+
+    def measure(self, audio_path):
+        """
+        First loudnorm pass, with silence detection in the same decode. Results are
+        cached per file content, so re-renders of the same narration skip the analysis.
+        Returns a dict with the loudnorm measurements and the 'start'/'end'/'duration'
+        of the narration once leading and trailing silence is cut, or None.
+        """
+        # target_offset depends on the targets, so they are part of the key
+        key = (f"{file_digest(audio_path)}:{'silence' if self.trim else 'raw'}"
+               f":{self.target_i}:{self.target_tp}:{self.target_lra}")
+        cache = self._load_cache()
+        if key in cache:
+            return cache[key]
+
+        # Silence does not skew the measurement: loudnorm gates out everything below -70 LUFS
+        chain = [SILENCE_DETECT] if self.trim else []
+        chain.append(f"loudnorm=I={self.target_i}:TP={self.target_tp}:LRA={self.target_lra}:print_format=json")
+        # The final progress line (time=...) gives the total duration
+        cmd = ['ffmpeg', '-hide_banner', '-stats', '-i', audio_path, '-af', ",".join(chain), '-f', 'null', '-']
+        try:
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=120)
+            stats = json.loads(result.stderr[result.stderr.rindex('{'):result.stderr.rindex('}') + 1])
+            times = re.findall(r'time=(\d+):(\d+):([\d.]+)', result.stderr)
+            h, m, s = times[-1]
+            total = int(h) * 3600 + int(m) * 60 + float(s)
+            start, end = self._speech_bounds(result.stderr, total)
+            measured = {
+                'input_i': stats['input_i'],
+                'input_tp': stats['input_tp'],
+                'input_lra': stats['input_lra'],
+                'input_thresh': stats['input_thresh'],
+                'target_offset': stats['target_offset'],
+                'start': start,
+                'end': end,
+                'duration': end - start,
+            }
+        except Exception as e:
+            logger.error(f"Loudness analysis failed for {audio_path}: {e}")
+            return None
+
+        self._save_cache(key, measured)
+        logger.info(f"Loudness: {measured['input_i']} LUFS -> {self.target_i} LUFS, "
+                    f"{measured['duration']:.1f}s after trim")
+        return measured
+
+    @staticmethod
+    def _speech_bounds(stderr, total):
+        """(start, end) of the audio without its leading and trailing silence."""
+        starts = [float(v) for v in re.findall(r'silence_start: (-?[\d.]+)', stderr)]
+        ends = [float(v) for v in re.findall(r'silence_end: ([\d.]+)', stderr)]
+        start, end = 0.0, total
+        if starts and starts[0] <= 0.01 and ends:
+            start = max(0.0, ends[0] - SILENCE_PADDING)
+        # Trailing silence either runs to the end of the file or is never closed
+        if starts and (len(ends) < len(starts) or ends[-1] >= total - 0.01):
+            end = min(total, starts[-1] + SILENCE_PADDING)
+        if end <= start:  # All silence: leave it alone
+            return 0.0, total
+        return round(start, 3), round(end, 3)
+
+    def duration(self, audio_path):
+        """Narration length after silence trimming, or None if unknown."""
+        if not self.trim:
+            return None
+        measured = self.measure(audio_path)
+        return measured['duration'] if measured else None
+
+    def filtergraph(self, audio_path, voice_index):
+        """
+        Returns (extra_input_args, graph). The graph reads input `voice_index`
+        (and the music input appended right after it) and ends in [aout].
+        """
+        measured = self.measure(audio_path) if self.enabled or self.trim else None
+        voice = []
+        if self.trim and measured:
+            voice.append(f"atrim=start={measured['start']}:end={measured['end']},asetpts=PTS-STARTPTS")
+        if self.enabled:
+            loudnorm = f"loudnorm=I={self.target_i}:TP={self.target_tp}:LRA={self.target_lra}"
+            if measured:
+                loudnorm += (f":measured_I={measured['input_i']}:measured_TP={measured['input_tp']}"
+                             f":measured_LRA={measured['input_lra']}:measured_thresh={measured['input_thresh']}"
+                             f":offset={measured['target_offset']}:linear=true")
+            voice.append(loudnorm)
+        # loudnorm resamples to 192 kHz internally
+        voice.append("aresample=48000")
+
+        if not self.music_path:
+            return [], f"[{voice_index}:a]{','.join(voice)}[aout]"
+
+        music_index = voice_index + 1
+        graph = ";".join([
+            f"[{voice_index}:a]{','.join(voice)},asplit=2[voice][key]",
+            f"[{music_index}:a]volume={self.music_volume_db}dB,aresample=48000[music]",
+            # Narration drives the compressor so the music dips while someone is speaking
+            "[music][key]sidechaincompress=threshold=0.02:ratio=8:attack=20:release=400[ducked]",
+            "[voice][ducked]amix=inputs=2:duration=first:dropout_transition=0:normalize=0[aout]",
+        ])
+        return ['-stream_loop', '-1', '-i', self.music_path], graph
+
+    def _read_cache_file(self):
+        try:
+            with open(self.cache_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _load_cache(self):
+        with self._lock:
+            if self._cache is None:
+                self._cache = self._read_cache_file()
+            return self._cache
+
+    def _save_cache(self, key, measured):
+        """
+        Merge the entry into the file as it is now, so entries written by other
+        processes since this one loaded the cache are kept. Each writer uses its
+        own temp file; the rename makes the update atomic.
+        """
+        with self._lock:
+            self._cache = self._read_cache_file()
+            self._cache[key] = measured
+            directory = os.path.dirname(self.cache_path)
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=".loudnorm_", suffix=".tmp", dir=directory)
+            try:
+                with os.fdopen(fd, 'w') as f:
+                    json.dump(self._cache, f)
+                os.chmod(tmp_path, 0o644)  # mkstemp creates 0600
+                os.replace(tmp_path, self.cache_path)
+            except OSError:
+                os.unlink(tmp_path)
+                raise
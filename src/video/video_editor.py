@@ -2,14 +2,26 @@ import logging
 import os
 import subprocess
 import json
+import math
+import shutil
+import tempfile
+import concurrent.futures
 from config.settings import Config
+from src.core.resource_governor import get_governor, run_measured
+from src.video.audio_mixer import AudioMixer
 
 logger = logging.getLogger(__name__)
 
+def _run_ffmpeg(cmd, timeout, memory_limit_mb=None):
+    """Run one FFmpeg command. Module-level so it can execute in a worker process."""
+    return run_measured(cmd, timeout, memory_limit_mb)
+
 class VideoEditor:
     def __init__(self):
         self.resolution = Config.VIDEO_RESOLUTION # (1080, 1920)
+        self.long_resolution = Config.LONG_VIDEO_RESOLUTION # (1920, 1080)
         self.fps = Config.FPS
+        self.audio_mixer = AudioMixer()
 
     def create_short(self, audio_path, visual_paths, script_text, output_path="final_video.mp4"):
         """
@@ -19,7 +31,7 @@ class VideoEditor:
         
         try:
             # 1. Get audio duration using FFprobe
-            duration = self._get_audio_duration(audio_path)
+            duration = self._get_narration_duration(audio_path)
             logger.info(f"Audio duration: {duration}s")
             
             if not visual_paths or len(visual_paths) == 0:
@@ -37,27 +49,31 @@ class VideoEditor:
             temp_video = os.path.join(Config.ASSETS_DIR, "temp_concatenated.mp4")
             
             # Concatenate videos, scale to 1080x1920, and trim to audio duration
+            # Video scaling and audio post-processing share one filtergraph (single pass)
+            music_inputs, audio_graph = self.audio_mixer.filtergraph(audio_path, voice_index=1)
+            video_graph = f'[0:v]scale={self.resolution[0]}:{self.resolution[1]}:force_original_aspect_ratio=increase,crop={self.resolution[0]}:{self.resolution[1]}[vout]'
             concat_cmd = [
                 'ffmpeg', '-y',
                 '-f', 'concat',
                 '-safe', '0',
                 '-i', concat_file,
                 '-i', audio_path,
+                *music_inputs,
                 '-t', str(duration),
-                '-vf', f'scale={self.resolution[0]}:{self.resolution[1]}:force_original_aspect_ratio=increase,crop={self.resolution[0]}:{self.resolution[1]}',
+                '-filter_complex', f"{video_graph};{audio_graph}",
                 '-c:v', 'libx264',
                 '-preset', 'ultrafast',  # Fast encoding
                 '-crf', '28',  # Lower quality = less memory
                 '-c:a', 'aac',
                 '-b:a', '128k',
                 '-shortest',
-                '-map', '0:v:0',  # video from concat
-                '-map', '1:a:0',  # audio from audio file
+                '-map', '[vout]',  # video from concat
+                '-map', '[aout]',  # processed narration (+ music)
                 temp_video
             ]
             
             logger.info("Running FFmpeg concatenation...")
-            result = subprocess.run(concat_cmd, capture_output=True, text=True, timeout=120)
+            result = get_governor().run(concat_cmd, kind='short', timeout=120, resolution=self.resolution)
             
             if result.returncode != 0:
                 logger.error(f"FFmpeg concat failed: {result.stderr}")
@@ -88,6 +104,297 @@ class VideoEditor:
             logger.error(f"Video creation failed: {e}", exc_info=True)
             return None
 
+    def create_short_streaming(self, audio_path, clips, script_text, output_path="final_video.mp4"):
+        """
+        Assembles a Short while clips are still downloading.
+        `clips` is any iterable of local paths (e.g. a ClipStream); each clip is
+        normalized into its own segment as soon as it arrives, overlapping encode
+        with the remaining downloads. Segments are then joined without re-encoding.
+        """
+        logger.info("Starting streaming video assembly with FFmpeg...")
+
+        work_dir = self._make_work_dir(output_path, "stream_segments")
+
+        try:
+            duration = self._get_narration_duration(audio_path)
+            logger.info(f"Audio duration: {duration}s")
+
+            governor = get_governor()
+            segments = []  # (path, length, future)
+            covered = 0
+            # One encoder thread: clip N encodes while clip N+1 is still downloading
+            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as encoder:
+                for clip_path in clips:
+                    clip_duration = self._get_media_duration(clip_path)
+                    if not clip_duration:
+                        continue
+                    length = min(clip_duration, duration - covered)
+                    segment_path = os.path.join(work_dir, f"segment_{len(segments):04d}.mp4")
+                    cmd = self._clip_segment_cmd(clip_path, length, segment_path)
+                    logger.info(f"Encoding clip {len(segments) + 1} ({length:.1f}s) as it arrives...")
+                    future = encoder.submit(governor.run, cmd, 'short_segment', max(60, length * 10), self.resolution)
+                    segments.append((segment_path, length, future))
+                    covered += length
+                    if covered >= duration - 1e-3:
+                        break  # Enough footage, do not wait for the remaining downloads
+                self._close_clips(clips)  # Stop the downloads nothing will use
+
+                for segment_path, _, future in segments:
+                    result = future.result()
+                    if result.returncode != 0:
+                        logger.error(f"FFmpeg segment {os.path.basename(segment_path)} failed: {result.stderr[-2000:]}")
+                        return None
+
+            if not segments:
+                logger.error("No visual files provided")
+                return None
+
+            # Loop the footage if the clips are shorter than the narration
+            playlist = [path for path, _, _ in segments]
+            total = covered
+            while total < duration - 1e-3:
+                for path, length, _ in segments:
+                    playlist.append(path)
+                    total += length
+                    if total >= duration - 1e-3:
+                        break
+
+            segment_list = os.path.join(work_dir, "segments.txt")
+            self._write_concat_file(segment_list, playlist)
+            # Video is stream-copied; the audio is processed and encoded in this same pass
+            music_inputs, audio_graph = self.audio_mixer.filtergraph(audio_path, voice_index=1)
+            join_cmd = [
+                'ffmpeg', '-y',
+                '-f', 'concat',
+                '-safe', '0',
+                '-i', segment_list,
+                '-i', audio_path,
+                *music_inputs,
+                '-t', str(duration),
+                '-filter_complex', audio_graph,
+                '-map', '0:v:0',
+                '-map', '[aout]',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-b:a', '128k',
+                output_path
+            ]
+            logger.info("Joining segments...")
+            result = governor.run(join_cmd, kind='join', timeout=120, threads=1)
+            if result.returncode != 0:
+                logger.error(f"FFmpeg join failed: {result.stderr[-2000:]}")
+                return None
+
+            logger.info(f"Video created successfully: {output_path}")
+            return output_path
+
+        except subprocess.TimeoutExpired:
+            logger.error("FFmpeg processing timed out")
+            return None
+        except Exception as e:
+            logger.error(f"Video creation failed: {e}", exc_info=True)
+            return None
+        finally:
+            self._close_clips(clips)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    @staticmethod
+    def _make_work_dir(output_path, prefix):
+        """
+        Scratch directory next to the output (the job directory in the pipeline),
+        unique per render so concurrent renders never clear each other's segments.
+        """
+        parent = os.path.dirname(os.path.abspath(output_path))
+        os.makedirs(parent, exist_ok=True)
+        return tempfile.mkdtemp(prefix=f"{prefix}_", dir=parent)
+
+    @staticmethod
+    def _close_clips(clips):
+        if hasattr(clips, 'close'):
+            clips.close()
+
+    def _clip_segment_cmd(self, clip_path, length, segment_path):
+        width, height = self.resolution
+        return [
+            'ffmpeg', '-y',
+            '-i', clip_path,
+            '-t', f"{length:.3f}",
+            '-vf', f'scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},fps={self.fps}',
+            '-an',
+            '-c:v', 'libx264',
+            '-preset', 'ultrafast',
+            '-crf', '28',
+            '-pix_fmt', 'yuv420p',
+            segment_path
+        ]
+
+    def create_long(self, audio_path, visual_paths, script_text, output_path="final_video.mp4"):
+        """
+        Assembles a 16:9 multi-minute video.
+        The timeline is split into GOP-aligned segments that are encoded in parallel
+        worker processes, then joined without re-encoding via the concat demuxer.
+        """
+        logger.info("Starting long-form video assembly with FFmpeg...")
+
+        if not visual_paths or len(visual_paths) == 0:
+            logger.error("No visual files provided")
+            return None
+
+        work_dir = self._make_work_dir(output_path, "segments")
+
+        try:
+            duration = self._get_narration_duration(audio_path)
+            logger.info(f"Audio duration: {duration}s")
+
+            clips = [(path, self._get_media_duration(path)) for path in visual_paths]
+            clips = [(path, d) for path, d in clips if d and d > 0]
+            if not clips:
+                logger.error("No usable visual files (could not read durations)")
+                return None
+
+            segments = self._plan_segments(duration)
+            workers = min(Config.RENDER_WORKERS, len(segments))
+            threads = max(1, (os.cpu_count() or 1) // workers)
+            logger.info(f"Encoding {len(segments)} segments with {workers} workers ({threads} threads each)...")
+
+            jobs = []
+            for index, (start, length) in enumerate(segments):
+                list_path = os.path.join(work_dir, f"segment_{index:04d}.txt")
+                self._write_timeline(list_path, clips, start, length)
+                segment_path = os.path.join(work_dir, f"segment_{index:04d}.mp4")
+                cmd = self._segment_cmd(list_path, length, segment_path, threads)
+                jobs.append((segment_path, cmd, max(120, length * 10)))
+
+            governor = get_governor()
+            with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = []
+                for _, cmd, timeout in jobs:
+                    # Admission happens here so the budget covers every worker process
+                    ticket = governor.acquire('long_segment', self.long_resolution, threads)
+                    future = executor.submit(_run_ffmpeg, cmd, timeout, governor.child_memory_limit_mb)
+                    future.add_done_callback(lambda f, t=ticket: self._release_segment(governor, t, f))
+                    futures.append(future)
+
+                for (segment_path, _, _), future in zip(jobs, futures):
+                    result = future.result()
+                    if result.returncode != 0:
+                        logger.error(f"FFmpeg segment {os.path.basename(segment_path)} failed: {result.stderr[-2000:]}")
+                        return None
+
+            # Join segments losslessly and process/mux the narration in the same pass
+            segment_list = os.path.join(work_dir, "segments.txt")
+            self._write_concat_file(segment_list, [path for path, _, _ in jobs])
+            music_inputs, audio_graph = self.audio_mixer.filtergraph(audio_path, voice_index=1)
+            join_cmd = [
+                'ffmpeg', '-y',
+                '-f', 'concat',
+                '-safe', '0',
+                '-i', segment_list,
+                '-i', audio_path,
+                *music_inputs,
+                '-filter_complex', audio_graph,
+                '-map', '0:v:0',
+                '-map', '[aout]',
+                '-c:v', 'copy',
+                '-c:a', 'aac',
+                '-b:a', '192k',
+                '-shortest',
+                '-movflags', '+faststart',
+                output_path
+            ]
+            logger.info("Joining segments...")
+            result = governor.run(join_cmd, kind='join', timeout=max(120, duration), threads=1)
+            if result.returncode != 0:
+                logger.error(f"FFmpeg join failed: {result.stderr[-2000:]}")
+                return None
+
+            logger.info(f"Video created successfully: {output_path}")
+            return output_path
+
+        except subprocess.TimeoutExpired:
+            logger.error("FFmpeg processing timed out")
+            return None
+        except Exception as e:
+            logger.error(f"Video creation failed: {e}", exc_info=True)
+            return None
+        finally:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    def _release_segment(self, governor, ticket, future):
+        measured = None
+        if not future.cancelled() and future.exception() is None:
+            measured = future.result()
+        governor.release(ticket, measured)
+
+    def _plan_segments(self, duration):
+        """Split [0, duration) into (start, length) pieces whose boundaries fall on GOP boundaries."""
+        gop = Config.GOP_SECONDS
+        segment_seconds = max(gop, round(Config.SEGMENT_SECONDS / gop) * gop)
+        count = max(1, math.ceil(duration / segment_seconds))
+        segments = []
+        for i in range(count):
+            start = i * segment_seconds
+            segments.append((start, min(segment_seconds, duration - start)))
+        return segments
+
+    def _write_timeline(self, list_path, clips, start, length):
+        """
+        Write a concat list covering [start, start + length) of a timeline that
+        loops through the clips in order. Uses inpoint/outpoint so each segment
+        only reads the parts of the clips it needs.
+        """
+        cycle = sum(d for _, d in clips)
+        position = start % cycle
+        remaining = length
+        index = 0
+        # Find the clip containing `position`
+        while position >= clips[index][1]:
+            position -= clips[index][1]
+            index = (index + 1) % len(clips)
+
+        with open(list_path, 'w') as f:
+            while remaining > 1e-3:
+                path, clip_duration = clips[index]
+                take = min(clip_duration - position, remaining)
+                f.write(f"file '{os.path.abspath(path)}'\n")
+                f.write(f"inpoint {position:.3f}\n")
+                f.write(f"outpoint {position + take:.3f}\n")
+                remaining -= take
+                position = 0
+                index = (index + 1) % len(clips)
+
+    def _segment_cmd(self, list_path, length, segment_path, threads):
+        width, height = self.long_resolution
+        gop = self.fps * Config.GOP_SECONDS
+        return [
+            'ffmpeg', '-y',
+            '-f', 'concat',
+            '-safe', '0',
+            '-i', list_path,
+            '-t', f"{length:.3f}",
+            '-vf', f'scale={width}:{height}:force_original_aspect_ratio=increase,crop={width}:{height},fps={self.fps}',
+            '-an',
+            '-c:v', 'libx264',
+            '-preset', 'veryfast',
+            '-crf', '23',
+            '-pix_fmt', 'yuv420p',
+            # Fixed, closed GOPs so every segment starts on a keyframe and joins cleanly
+            '-g', str(gop),
+            '-keyint_min', str(gop),
+            '-sc_threshold', '0',
+            '-threads', str(threads),
+            segment_path
+        ]
+
+    def _write_concat_file(self, list_path, paths):
+        with open(list_path, 'w') as f:
+            for path in paths:
+                f.write(f"file '{os.path.abspath(path)}'\n")
+
+    def _get_narration_duration(self, audio_path):
+        """Duration of the narration as it will be muxed (after silence trimming, if enabled)."""
+        return self.audio_mixer.duration(audio_path) or self._get_audio_duration(audio_path)
+
     def _get_audio_duration(self, audio_path):
         """Get audio duration using FFprobe"""
         try:
@@ -106,6 +413,22 @@ class VideoEditor:
             logger.error(f"Failed to get audio duration: {e}")
             return 60  # Default to 60 seconds
 
+    def _get_media_duration(self, media_path):
+        """Get container duration using FFprobe, or None if it cannot be read"""
+        try:
+            cmd = [
+                'ffprobe',
+                '-v', 'error',
+                '-show_entries', 'format=duration',
+                '-of', 'json',
+                media_path
+            ]
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=10)
+            return float(json.loads(result.stdout)['format']['duration'])
+        except Exception as e:
+            logger.error(f"Failed to get duration of {media_path}: {e}")
+            return None
+
 if __name__ == "__main__":
     # Mock test
     pass